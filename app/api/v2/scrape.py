@@ -115,7 +115,9 @@ async def diagnose_scrape(url: str = Query(..., description="URL do site para di
     from app.services.scraper.html_parser import parse_html, extract_links
     from app.services.scraper.link_selector import filter_non_html_links, prioritize_links
     from app.services.scraper.constants import HIGH_PRIORITY_KEYWORDS, LOW_PRIORITY_KEYWORDS
-    from app.services.scraper.scraper_service import _scrape_page_with_retry
+    from app.services.scraper.scraper_service import _scrape_page_with_retry, _ctx_label
+
+    _ctx_label.set("[DIAG] ")
 
     diag = {"url_original": url, "phases": {}}
 
@@ -138,7 +140,7 @@ async def diagnose_scrape(url: str = Query(..., description="URL do site para di
 
     # 2. SCRAPE MAIN PAGE
     t0 = time.perf_counter()
-    main_page = await _scrape_page_with_retry(url, "[DIAG] ")
+    main_page = await _scrape_page_with_retry(url)
     diag["phases"]["main_page"] = {
         "duration_ms": round((time.perf_counter() - t0) * 1000),
         "success": main_page.success if main_page else False,
@@ -153,7 +155,10 @@ async def diagnose_scrape(url: str = Query(..., description="URL do site para di
         return diag
 
     # 3. PARSE + FILTER + PRIORITIZE
-    links = set(main_page.links)
+    # links já é o set do parse_html; só materializa se vier outra coleção
+    links = main_page.links
+    if not isinstance(links, (set, frozenset)):
+        links = set(links)
     filtered = filter_non_html_links(links)
     diag["phases"]["filter_non_html"] = {
         "before": len(links), "after": len(filtered),
@@ -190,7 +195,7 @@ async def diagnose_scrape(url: str = Query(..., description="URL do site para di
         for sub_url in target_urls:
             t0 = time.perf_counter()
             try:
-                page = await _scrape_page_with_retry(sub_url, "[DIAG] ")
+                page = await _scrape_page_with_retry(sub_url)
                 dur = round((time.perf_counter() - t0) * 1000)
                 subpage_results.append({
                     "url": sub_url,
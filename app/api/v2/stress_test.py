@@ -76,11 +76,10 @@ async def _fetch_urls_from_db(limit: int) -> list:
 async def _fetch_one(session, url: str) -> dict:
     t0 = time.perf_counter()
     try:
-        resp = await asyncio.wait_for(
-            session.get(url, headers=HEADERS, proxy=PROXY, timeout=TIMEOUT,
-                        allow_redirects=True, max_redirects=5),
-            timeout=TIMEOUT + 5,
-        )
+        # asyncio.timeout: deadline na própria task, sem Task extra do wait_for
+        async with asyncio.timeout(TIMEOUT + 5):
+            resp = await session.get(url, headers=HEADERS, proxy=PROXY, timeout=TIMEOUT,
+                                     allow_redirects=True, max_redirects=5)
         lat = (time.perf_counter() - t0) * 1000
         content_len = len(resp.content) if resp.content else 0
         status = resp.status_code
@@ -124,14 +123,18 @@ async def run_stress_test(req: StressTestRequest):
 
     session = AsyncSession(impersonate="chrome131", verify=False,
                            max_clients=concurrent + 100)
-    sem = asyncio.Semaphore(concurrent)
     counter = {"done": 0, "ok": 0}
     total = len(urls)
+    results: list = [None] * total
+    # Pool fixo de `concurrent` workers puxando de um iterador compartilhado:
+    # só existem as coroutines em voo, não uma por URL esperando no semáforo
+    pending = enumerate(urls)
     t_start = time.perf_counter()
 
-    async def limited_fetch(url):
-        async with sem:
+    async def worker():
+        for idx, url in pending:
             r = await _fetch_one(session, url)
+            results[idx] = r
             counter["done"] += 1
             if r["ok"]:
                 counter["ok"] += 1
@@ -140,10 +143,8 @@ async def run_stress_test(req: StressTestRequest):
                 elapsed = time.perf_counter() - t_start
                 rate = counter["ok"] / done * 100 if done else 0
                 logger.info(f"[stress-test] {done}/{total} | ok={rate:.1f}% | {elapsed:.1f}s")
-            return r
 
-    tasks = [limited_fetch(u) for u in urls]
-    results = await asyncio.gather(*tasks)
+    await asyncio.gather(*(worker() for _ in range(concurrent)))
     total_time = time.perf_counter() - t_start
 
     await session.close()
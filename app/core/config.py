@@ -111,6 +111,9 @@ class Settings:
     
     # MODEL_NAME: Nome do modelo
     MODEL_NAME: str = _model_name_raw if _model_name_raw else "Qwen/Qwen3-8B"
+
+    # Máximo de chamadas simultâneas ao SGLang (todas as empresas somadas)
+    SGLANG_MAX_INFLIGHT: int = int(os.getenv("SGLANG_MAX_INFLIGHT", "50"))
     
     # Variáveis legadas (mantidas por compatibilidade, apontam para novas)
     VLLM_BASE_URL: str = URL_MODEL
@@ -0,0 +1,38 @@
+"""
+Configuração do event loop.
+
+uvloop (libuv) substitui o selector padrão do asyncio: agenda callbacks e
+despacha I/O de rede bem mais rápido — exatamente o perfil do scraper
+(milhares de coroutines curtas esperando socket). Em plataformas sem uvloop
+(Windows) cai no loop padrão sem erro.
+"""
+
+import asyncio
+import logging
+from typing import Any, Coroutine, TypeVar
+
+logger = logging.getLogger(__name__)
+
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    uvloop = None
+    HAS_UVLOOP = False
+
+T = TypeVar("T")
+
+
+def run(main: Coroutine[Any, Any, T]) -> T:
+    """
+    asyncio.run num loop uvloop quando disponível (scripts/CLI).
+    Usa uvloop.run (loop_factory) em vez de uvloop.install(), que muda a
+    policy global e está depreciado no Python 3.12+.
+
+    A API não passa por aqui: o servidor cria o loop antes de importar o
+    app (hypercorn --worker-class uvloop no Procfile/Dockerfile).
+    """
+    if not HAS_UVLOOP:
+        logger.info("[EventLoop] uvloop não disponível, usando loop padrão do asyncio")
+        return asyncio.run(main)
+    return uvloop.run(main)
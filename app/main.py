@@ -39,6 +39,11 @@ from app.api.v2.router import router as v2_router
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Event loop: o servidor cria o loop antes de importar o app, então instalar
+# o uvloop aqui não teria efeito. Quem escolhe é o comando de subida
+# (hypercorn --worker-class uvloop no Procfile/Dockerfile; uvicorn usa
+# uvloop sozinho com --loop auto quando instalado).
+
 app = FastAPI(title="B2B Flash Profiler")
 
 # Registrar router v2
@@ -75,6 +80,16 @@ async def startup_event():
 async def shutdown_event():
     """Executado quando a aplicação encerra"""
     await close_pool()
+    try:
+        from app.services.scraper.http_client import close_sessions
+        await close_sessions()
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao fechar sessions do scraper: {e}")
+    try:
+        from app.services.llm_sglang_client import close_sglang_client
+        await close_sglang_client()
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao fechar cliente do SGLang: {e}")
     logger.info("🔌 Aplicação encerrada")
 
 
@@ -10,17 +10,23 @@ import bisect
 import concurrent.futures
 import json
 import logging
+import re
 import time
 import traceback
 import uuid
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 
 from app.services.scraper.scraper_service import scrape_all_subpages
 from app.services.scraper.models import ScrapeResult
+from app.services.scraper.error_patterns import match_by_priority
+from app.services.scraper.html_parser import url_host
 from app.core.chunking import process_content
 from app.services.database_service import get_db_service
-from app.services.scraper.constants import WORKERS_PER_INSTANCE, NUM_INSTANCES, FLUSH_SIZE
+from app.services.scraper.constants import (
+    WORKERS_PER_INSTANCE, NUM_INSTANCES, FLUSH_SIZE, COMPANY_TIME_BUDGET,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -49,19 +55,29 @@ ERROR_CATEGORIES = {
 }
 
 
+# Keywords compiladas num regex por classificador (ver error_patterns):
+# uma passada sobre a mensagem em vez de lower() + N varreduras.
+_TRANSIENT_PATTERN = re.compile(
+    "|".join(map(re.escape, TRANSIENT_KEYWORDS)), re.IGNORECASE
+)
+
+_ERROR_CATEGORY_PATTERN = re.compile(
+    "|".join(
+        f"(?P<{category}>{'|'.join(map(re.escape, keywords))})"
+        for category, keywords in ERROR_CATEGORIES.items()
+    ),
+    re.IGNORECASE,
+)
+
+
 def _is_transient(error_msg: str) -> bool:
-    lower = error_msg.lower()
-    return any(kw in lower for kw in TRANSIENT_KEYWORDS)
+    return _TRANSIENT_PATTERN.search(error_msg) is not None
 
 
 def _classify_error(error_msg: str) -> str:
     if not error_msg:
         return "unknown"
-    lower = error_msg.lower()
-    for category, keywords in ERROR_CATEGORIES.items():
-        if any(kw in lower for kw in keywords):
-            return category
-    return "other"
+    return match_by_priority(_ERROR_CATEGORY_PATTERN, error_msg) or "other"
 
 
 def _build_error_summary(scrape_result: ScrapeResult, fallback_error: str = "") -> str:
@@ -111,7 +127,52 @@ def _build_error_summary(scrape_result: ScrapeResult, fallback_error: str = "")
     return json.dumps(summary, ensure_ascii=False)
 
 
+def _interleave_by_domain(
+    companies: List[Dict[str, Any]], window: int,
+) -> List[Dict[str, Any]]:
+    """
+    Dentro de cada bloco de `window` empresas consecutivas, espalha as
+    empresas de cada site por igual: as k empresas de um host vão para
+    posições ~len(bloco)/k uma da outra (chave (rank + fase) / k, com fase
+    distinta por host para sites diferentes não caírem no mesmo ponto).
+    Empresas do mesmo site (filiais, grupos) vêm em sequência do banco e
+    cairiam em workers simultâneos disputando o mesmo host. Com o bloco do
+    tamanho de uma "onda" de workers, as repetições ficam afastadas sem sair
+    do bloco — continuam perto o bastante para aproveitar o cache do probe e
+    a janela do circuit breaker, em vez de irem para o fim do batch. Um host
+    com mais da metade do bloco ainda terá vizinhos repetidos.
+    """
+    window = max(1, window)
+    result: List[Dict[str, Any]] = []
+    for start in range(0, len(companies), window):
+        block = companies[start:start + window]
+        hosts: List[str] = []
+        counts: Dict[str, int] = {}
+        for company in block:
+            url = company.get('website_url') or ''
+            host = url_host(url if '//' in url else '//' + url).removeprefix('www.')
+            hosts.append(host)
+            counts[host] = counts.get(host, 0) + 1
+        if len(counts) == len(block):
+            result.extend(block)
+            continue
+        # dict preserva a ordem da 1ª aparição: fase k/n por host
+        phase = {host: k / len(counts) for k, host in enumerate(counts)}
+        seen: Dict[str, int] = {}
+        keys = []
+        for i, host in enumerate(hosts):
+            rank = seen.get(host, 0)
+            seen[host] = rank + 1
+            keys.append(((rank + phase[host]) / counts[host], i))
+        order = sorted(range(len(block)), key=keys.__getitem__)
+        result.extend(block[i] for i in order)
+    return result
+
+
+@lru_cache(maxsize=1024)
 def _bucket_fail_reason(reason: str) -> str:
+    """Agrupa o motivo de falha em bucket. Poucos motivos distintos se repetem
+    em milhões de empresas — resultado cacheado."""
     if not reason:
         return "unknown"
     r = reason.lower()
@@ -153,6 +214,8 @@ def _bucket_fail_reason(reason: str) -> str:
             return "scrape:blocked_cloudflare"
         return "scrape:blocked_waf"
 
+    if r == "company_deadline":
+        return "scrape:deadline"
     if "soft 404" in r or "soft_404" in r:
         return "scrape:soft_404"
     if "cloudflare" in r:
@@ -171,29 +234,31 @@ def _bucket_fail_reason(reason: str) -> str:
     return f"other:{reason[:30]}"
 
 
+# Bucket (_bucket_fail_reason) → categoria do diagnóstico
+_FAIL_BUCKET_CATEGORY = {
+    "probe:dns": "site_offline", "probe:refused": "site_offline",
+    "probe:server_error": "site_offline", "probe:redirect_loop": "site_offline",
+    "probe:timeout": "proxy_infra", "probe:ssl": "site_offline",
+    "probe:other": "proxy_infra", "probe:blocked": "blocked",
+    "proxy:timeout": "proxy_infra", "proxy:connection": "proxy_infra",
+    "proxy:ssl": "proxy_infra", "proxy:empty_response": "proxy_infra",
+    "proxy:other": "proxy_infra", "proxy:http_403": "blocked",
+    "proxy:http_5xx": "site_offline",
+    "scrape:blocked_waf": "blocked", "scrape:blocked_cloudflare": "blocked",
+    "scrape:cloudflare": "blocked", "scrape:soft_404": "content_issue",
+    "scrape:thin_content": "content_issue", "scrape:empty_content": "content_issue",
+    "scrape:error": "other", "scrape:null_response": "other",
+    "scrape:timeout": "proxy_infra", "scrape:deadline": "proxy_infra",
+}
+
+
 def _build_failure_diagnosis(fail_reasons: Dict[str, int], total_processed: int) -> dict:
     categories: Dict[str, Dict[str, int]] = {
         "site_offline": {}, "proxy_infra": {}, "blocked": {},
         "content_issue": {}, "other": {},
     }
-    mapping = {
-        "probe:dns": "site_offline", "probe:refused": "site_offline",
-        "probe:server_error": "site_offline", "probe:redirect_loop": "site_offline",
-        "probe:timeout": "proxy_infra", "probe:ssl": "site_offline",
-        "probe:other": "proxy_infra", "probe:blocked": "blocked",
-        "proxy:timeout": "proxy_infra", "proxy:connection": "proxy_infra",
-        "proxy:ssl": "proxy_infra", "proxy:empty_response": "proxy_infra",
-        "proxy:other": "proxy_infra", "proxy:http_403": "blocked",
-        "proxy:http_5xx": "site_offline",
-        "scrape:blocked_waf": "blocked", "scrape:blocked_cloudflare": "blocked",
-        "scrape:cloudflare": "blocked", "scrape:soft_404": "content_issue",
-        "scrape:thin_content": "content_issue", "scrape:empty_content": "content_issue",
-        "scrape:error": "other", "scrape:null_response": "other",
-        "scrape:timeout": "proxy_infra",
-    }
-
     for reason, count in fail_reasons.items():
-        cat = mapping.get(reason, "other")
+        cat = _FAIL_BUCKET_CATEGORY.get(reason, "other")
         categories[cat][reason] = count
 
     total_failures = sum(fail_reasons.values())
@@ -251,6 +316,8 @@ class BatchInstance:
         self._queue: asyncio.Queue = asyncio.Queue(maxsize=worker_count * 2)
         self._buffer: List[CompanyResult] = []
         self._buffer_lock = asyncio.Lock()
+        self._all_done = asyncio.Event()
+        self._retry_tasks: set = set()
 
         self.total = len(companies)
         self.processed = 0
@@ -294,18 +361,18 @@ class BatchInstance:
         label = f"[Batch {self.batch_id} I{self.instance_id}]"
         logger.info(f"{label} Iniciando: {self.total} empresas, {self.worker_count} workers")
 
+        feeder = asyncio.create_task(self._feed_queue())
+        workers: List[asyncio.Task] = []
         try:
+            # Feeder antes do ramp: os primeiros workers já consomem a fila
+            # enquanto o restante é criado, em vez de esperar o ramp inteiro.
+            # O teto real de concorrência é o semáforo global do http_client:
+            # entre lotes só cede o loop, sem pausa fixa em escada.
             ramp_batch = 200
-            workers = []
             for i in range(self.worker_count):
                 workers.append(asyncio.create_task(self._worker(i)))
                 if (i + 1) % ramp_batch == 0 and i + 1 < self.worker_count:
-                    await asyncio.sleep(0.1)
-
-            for company in self.companies:
-                await self._queue.put(company)
-            for _ in range(self.worker_count):
-                await self._queue.put(None)
+                    await asyncio.sleep(0)
 
             await asyncio.gather(*workers)
             await self._flush_buffer(force=True)
@@ -318,23 +385,56 @@ class BatchInstance:
             self.status = "cancelled"
         except Exception as e:
             logger.error(f"{label} Erro fatal: {e}", exc_info=True)
+            # Erro fatal num worker encerra o gather mas não os irmãos: sem o
+            # feeder eles ficariam presos na fila para sempre. Cancelados
+            # antes do flush, nenhum resultado entra no buffer depois dele.
+            for task in workers:
+                task.cancel()
             await self._flush_buffer(force=True)
             self.status = "error"
+        finally:
+            feeder.cancel()
+            for task in self._retry_tasks:
+                task.cancel()
+
+    async def _feed_queue(self):
+        """Enfileira as empresas; só manda os sentinelas quando todas finalizaram
+        (retries agendados ainda podem voltar para a fila até lá)."""
+        if not self.companies:
+            self._all_done.set()
+        for company in self.companies:
+            await self._queue.put((company, 0))
+        await self._all_done.wait()
+        for _ in range(self.worker_count):
+            await self._queue.put(None)
+
+    def _schedule_retry(self, company: Dict[str, Any], attempt: int, delay: float):
+        """Devolve a empresa à fila após o backoff, sem prender o worker no sleep."""
+        async def requeue():
+            await asyncio.sleep(delay)
+            await self._queue.put((company, attempt))
+
+        task = asyncio.create_task(requeue())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
 
     async def _worker(self, worker_id: int):
         while True:
             item = await self._queue.get()
             if item is None:
                 break
+            company, attempt = item
 
             self.in_progress += 1
             self._peak_in_progress = max(self._peak_in_progress, self.in_progress)
 
             t0 = time.perf_counter()
-            result = await self._process_company(item, worker_id)
-            result.processing_time_ms = (time.perf_counter() - t0) * 1000
+            result = await self._process_company(company, worker_id, attempt)
 
             self.in_progress -= 1
+            if result is None:
+                continue
+            result.processing_time_ms = (time.perf_counter() - t0) * 1000
 
             pending_flush = None
             async with self._buffer_lock:
@@ -356,111 +456,109 @@ class BatchInstance:
                     pending_flush = self._buffer
                     self._buffer = []
 
-            if pending_flush is not None:
-                await self._flush_buffer_data(pending_flush)
+                if self.processed >= self.total:
+                    self._all_done.set()
 
-    async def _process_company(self, company: Dict[str, Any], worker_id: int) -> CompanyResult:
+            if pending_flush is not None:
+                # O lote já saiu do buffer: cancelar o worker no meio do flush
+                # perderia esses resultados. shield deixa a gravação terminar.
+                await asyncio.shield(self._flush_buffer_data(pending_flush))
+
+    async def _process_company(
+        self, company: Dict[str, Any], worker_id: int, attempt: int = 0,
+    ) -> Optional[CompanyResult]:
+        """
+        Uma tentativa de scrape da empresa. Em falha transitória com tentativas
+        restantes, agenda o retry (backoff fora do worker) e retorna None.
+        """
         cnpj = company['cnpj_basico']
         url = company['website_url']
         discovery_id = company.get('wd_id')
         max_retries = 2
 
-        for attempt in range(max_retries + 1):
-            try:
-                result = await scrape_all_subpages(
-                    url=url, max_subpages=15,
-                    ctx_label=f"[B{self.batch_id}I{self.instance_id}]",
-                    request_id=cnpj,
+        try:
+            result = await scrape_all_subpages(
+                url=url, max_subpages=15,
+                ctx_label=f"[B{self.batch_id}I{self.instance_id}]",
+                request_id=cnpj,
+                deadline=time.monotonic() + COMPANY_TIME_BUDGET if COMPANY_TIME_BUDGET > 0 else None,
+            )
+            self._aggregate_scrape_meta(result)
+            pages = result.pages
+            total_pages = len(pages) if pages else 0
+            successful_pages = [p for p in (pages or []) if p.success]
+
+            if not successful_pages:
+                error_msg = "Nenhum conteudo obtido"
+                if pages:
+                    first_err = next((p.error for p in pages if p.error), None)
+                    if first_err:
+                        error_msg = f"Nenhum conteudo obtido: {first_err}"
+                if attempt < max_retries and _is_transient(error_msg):
+                    self._schedule_retry(company, attempt + 1, 2 ** (attempt + 1))
+                    return None
+                return CompanyResult(
+                    cnpj_basico=cnpj, discovery_id=discovery_id,
+                    website_url=url,
+                    error=_build_error_summary(result, error_msg),
+                    total_pages_attempted=total_pages, retries_used=attempt,
                 )
-                self._aggregate_scrape_meta(result)
-                pages = result.pages
-                total_pages = len(pages) if pages else 0
-                successful_pages = [p for p in (pages or []) if p.success]
-
-                if not successful_pages:
-                    error_msg = "Nenhum conteudo obtido"
-                    if pages:
-                        first_err = next((p.error for p in pages if p.error), None)
-                        if first_err:
-                            error_msg = f"Nenhum conteudo obtido: {first_err}"
-                    if attempt < max_retries and _is_transient(error_msg):
-                        await asyncio.sleep(2 ** (attempt + 1))
-                        continue
-                    return CompanyResult(
-                        cnpj_basico=cnpj, discovery_id=discovery_id,
-                        website_url=url,
-                        error=_build_error_summary(result, error_msg),
-                        total_pages_attempted=total_pages, retries_used=attempt,
-                    )
-
-                parts = []
-                visited = []
-                for page in successful_pages:
-                    parts.append(f"--- PAGE START: {page.url} ---\n{page.content}\n--- PAGE END ---")
-                    visited.append(page.url)
-
-                aggregated = "\n\n".join(parts)
-                if len(aggregated.strip()) < 100:
-                    return CompanyResult(
-                        cnpj_basico=cnpj, discovery_id=discovery_id,
-                        website_url=url,
-                        error=_build_error_summary(result, f"Conteudo insuficiente ({len(aggregated)} chars)"),
-                        pages_scraped=len(successful_pages),
-                        total_pages_attempted=total_pages, retries_used=attempt,
-                    )
-
-                chunks = process_content(aggregated)
-                if not chunks:
-                    return CompanyResult(
-                        cnpj_basico=cnpj, discovery_id=discovery_id,
-                        website_url=url,
-                        error=_build_error_summary(result, "Nenhum chunk gerado"),
-                        pages_scraped=len(successful_pages),
-                        total_pages_attempted=total_pages, retries_used=attempt,
-                    )
-
-                for chunk in chunks:
-                    if not hasattr(chunk, 'pages_included') or not chunk.pages_included:
-                        chunk.pages_included = visited[:5]
 
+            parts = []
+            visited = []
+            for page in successful_pages:
+                parts.append(f"--- PAGE START: {page.url} ---\n{page.content}\n--- PAGE END ---")
+                visited.append(page.url)
+
+            aggregated = "\n\n".join(parts)
+            if len(aggregated.strip()) < 100:
                 return CompanyResult(
                     cnpj_basico=cnpj, discovery_id=discovery_id,
-                    website_url=url, chunks=chunks, success=True,
+                    website_url=url,
+                    error=_build_error_summary(result, f"Conteudo insuficiente ({len(aggregated)} chars)"),
                     pages_scraped=len(successful_pages),
                     total_pages_attempted=total_pages, retries_used=attempt,
                 )
-            except Exception as e:
-                error_msg = f"{type(e).__name__}: {str(e)}"
-                if attempt < max_retries and _is_transient(error_msg):
-                    await asyncio.sleep(2 ** (attempt + 1))
-                    continue
-                self._record_error(cnpj, url, error_msg)
-                exc_summary = json.dumps({
-                    "error_category": _classify_error(error_msg),
-                    "main_page": {"ok": False, "fail_reason": None},
-                    "subpages": {"attempted": 0, "ok": 0, "errors": {}},
-                    "pages_total": 0, "pages_ok": 0, "pages_failed": 0,
-                    "resumo": f"Exceção no pipeline: {error_msg[:200]}",
-                    "processing_time_ms": 0,
-                }, ensure_ascii=False)
+
+            chunks = process_content(aggregated)
+            if not chunks:
                 return CompanyResult(
                     cnpj_basico=cnpj, discovery_id=discovery_id,
-                    website_url=url, error=exc_summary,
-                    retries_used=attempt,
+                    website_url=url,
+                    error=_build_error_summary(result, "Nenhum chunk gerado"),
+                    pages_scraped=len(successful_pages),
+                    total_pages_attempted=total_pages, retries_used=attempt,
                 )
 
-        max_retry_summary = json.dumps({
-            "error_category": "max_retries",
-            "main_page": {"ok": False, "fail_reason": None},
-            "subpages": {"attempted": 0, "ok": 0, "errors": {}},
-            "pages_total": 0, "pages_ok": 0, "pages_failed": 0,
-            "resumo": "Esgotou tentativas de retry",
-            "processing_time_ms": 0,
-        }, ensure_ascii=False)
-        return CompanyResult(
-            cnpj_basico=cnpj, discovery_id=discovery_id,
-            website_url=url, error=max_retry_summary, retries_used=max_retries,
-        )
+            for chunk in chunks:
+                if not hasattr(chunk, 'pages_included') or not chunk.pages_included:
+                    chunk.pages_included = visited[:5]
+
+            return CompanyResult(
+                cnpj_basico=cnpj, discovery_id=discovery_id,
+                website_url=url, chunks=chunks, success=True,
+                pages_scraped=len(successful_pages),
+                total_pages_attempted=total_pages, retries_used=attempt,
+            )
+        except Exception as e:
+            error_msg = f"{type(e).__name__}: {str(e)}"
+            if attempt < max_retries and _is_transient(error_msg):
+                self._schedule_retry(company, attempt + 1, 2 ** (attempt + 1))
+                return None
+            self._record_error(cnpj, url, error_msg)
+            exc_summary = json.dumps({
+                "error_category": _classify_error(error_msg),
+                "main_page": {"ok": False, "fail_reason": None},
+                "subpages": {"attempted": 0, "ok": 0, "errors": {}},
+                "pages_total": 0, "pages_ok": 0, "pages_failed": 0,
+                "resumo": f"Exceção no pipeline: {error_msg[:200]}",
+                "processing_time_ms": 0,
+            }, ensure_ascii=False)
+            return CompanyResult(
+                cnpj_basico=cnpj, discovery_id=discovery_id,
+                website_url=url, error=exc_summary,
+                retries_used=attempt,
+            )
 
     def _aggregate_scrape_meta(self, result) -> None:
         self._links_in_html_total += result.links_in_html
@@ -468,10 +566,10 @@ class BatchInstance:
         self._links_selected_total += result.links_selected
         self._subpages_attempted_total += result.subpages_attempted
         self._subpages_ok_total += result.subpages_ok
+        bucket = None
         if not result.main_page_ok:
             self._main_page_failures += 1
-            reason = result.main_page_fail_reason or "unknown"
-            bucket = _bucket_fail_reason(reason)
+            bucket = _bucket_fail_reason(result.main_page_fail_reason or "unknown")
             self._main_page_fail_reasons[bucket] = self._main_page_fail_reasons.get(bucket, 0) + 1
         if result.links_in_html == 0 and result.main_page_ok:
             self._zero_links_companies += 1
@@ -484,8 +582,8 @@ class BatchInstance:
             self._probe_ok += 1
         else:
             self._probe_fail += 1
-            reason = result.main_page_fail_reason or "unknown"
-            bucket = _bucket_fail_reason(reason)
+            if bucket is None:
+                bucket = _bucket_fail_reason(result.main_page_fail_reason or "unknown")
             self._probe_fail_reasons[bucket] = self._probe_fail_reasons.get(bucket, 0) + 1
 
         if result.probe_ok and result.main_scrape_time_ms > 0:
@@ -494,8 +592,6 @@ class BatchInstance:
             self._main_scrape_ok += 1
         elif result.probe_ok:
             self._main_scrape_fail += 1
-            reason = result.main_page_fail_reason or "unknown"
-            bucket = _bucket_fail_reason(reason)
             self._main_scrape_fail_reasons[bucket] = self._main_scrape_fail_reasons.get(bucket, 0) + 1
 
         if result.main_page_ok and result.subpages_time_ms > 0:
@@ -647,6 +743,8 @@ class BatchScrapeProcessor:
             self.status = "completed"
             return
 
+        # Bloco = total de workers: uma "onda" de empresas em voo ao mesmo tempo
+        all_companies = _interleave_by_domain(all_companies, self.worker_count)
         self.total = len(all_companies)
         workers_per_instance = max(1, self.worker_count // self.num_instances)
         partitions = self._partition(all_companies, self.num_instances)
@@ -887,23 +985,15 @@ class BatchScrapeProcessor:
             stats["proxy"] = {"error": "unavailable"}
 
         try:
-            from app.services.scraper.constants import (
-                REQUEST_TIMEOUT, PROBE_TIMEOUT, MAX_RETRIES, RETRY_DELAY,
-                MAX_SUBPAGES, PER_DOMAIN_CONCURRENT, WORKERS_PER_INSTANCE,
-                NUM_INSTANCES, FLUSH_SIZE, MIN_CONTENT_LENGTH,
-            )
-            stats["config"] = {
-                "request_timeout": REQUEST_TIMEOUT,
-                "probe_timeout": PROBE_TIMEOUT,
-                "max_retries": MAX_RETRIES,
-                "retry_delay": RETRY_DELAY,
-                "max_subpages": MAX_SUBPAGES,
-                "per_domain_concurrent": PER_DOMAIN_CONCURRENT,
-                "workers_per_instance": WORKERS_PER_INSTANCE,
-                "num_instances": NUM_INSTANCES,
-                "flush_size": FLUSH_SIZE,
-                "min_content_length": MIN_CONTENT_LENGTH,
-            }
+            from app.services.scraper.http_client import get_pool_status
+            stats["sessions"] = get_pool_status()
+        except Exception:
+            stats["sessions"] = {"error": "unavailable"}
+
+        try:
+            from dataclasses import asdict
+            from app.services.scraper.constants import SCRAPER_SETTINGS
+            stats["config"] = asdict(SCRAPER_SETTINGS)
         except Exception:
             pass
 
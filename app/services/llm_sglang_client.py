@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from typing import Any, Dict, List, Optional, Tuple
@@ -47,12 +48,14 @@ class SGLangClient:
         api_key: Optional[str] = None,
         timeout: float = 60.0,
         phoenix_project: str = "sglang-qwen-vast",
+        max_inflight: Optional[int] = None,
     ) -> None:
         self.base_url = (base_url or settings.URL_MODEL).rstrip("/")
         self.model = model or settings.MODEL_NAME
         self.api_key = api_key or settings.MODEL_KEY
         self.timeout = timeout
         self.phoenix_project = phoenix_project
+        self.max_inflight = max_inflight or settings.SGLANG_MAX_INFLIGHT
 
         if not self.base_url:
             raise ValueError("SGLangClient: URL_MODEL/BASE_URL não configurado.")
@@ -70,6 +73,36 @@ class SGLangClient:
 
         self._headers = headers
         self._tracer_provider = setup_phoenix_tracing(self.phoenix_project)
+        # Cliente HTTP persistente: reaproveita conexões keep-alive entre
+        # chamadas em vez de refazer TCP/TLS a cada completion
+        self._http: Optional[httpx.AsyncClient] = None
+        # Teto de chamadas em voo: o fact extractor dispara todos os chunks
+        # de uma vez e, com várias empresas em paralelo, o SGLang só
+        # acumularia fila e estouraria timeouts
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """Cria o httpx.AsyncClient na primeira chamada (lazy) ou se foi fechado."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                # Sem teto de conexões no pool: quem limita é o semáforo de
+                # chamadas em voo (um teto aqui só geraria PoolTimeout)
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+            )
+        return self._http
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Semáforo de chamadas em voo (lazy, criado dentro do event loop)."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        return self._semaphore
+
+    async def aclose(self) -> None:
+        """Fecha o cliente HTTP persistente (shutdown da aplicação)."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def chat_completion(
         self,
@@ -123,8 +156,8 @@ class SGLangClient:
         )
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                resp = await client.post(url, headers=self._headers, json=payload)
+            async with self._get_semaphore():
+                resp = await self._get_http().post(url, headers=self._headers, json=payload)
         except httpx.TimeoutException as e:
             if span:
                 span.set_attribute("http.error", "timeout")
@@ -176,3 +209,9 @@ def get_sglang_client() -> SGLangClient:
         _sglang_client = SGLangClient()
     return _sglang_client
 
+
+async def close_sglang_client() -> None:
+    """Fecha as conexões do singleton, se ele chegou a ser criado."""
+    if _sglang_client is not None:
+        await _sglang_client.aclose()
+
@@ -7,7 +7,9 @@ from .html_parser import (
     parse_html,
     is_cloudflare_challenge,
     is_soft_404,
+    is_usable_content,
     normalize_url,
+    url_host,
 )
 from .link_selector import (
     extract_and_prioritize_links,
@@ -32,7 +34,9 @@ __all__ = [
     'parse_html',
     'is_cloudflare_challenge',
     'is_soft_404',
+    'is_usable_content',
     'normalize_url',
+    'url_host',
     'extract_and_prioritize_links',
     'prioritize_links',
     'filter_non_html_links',
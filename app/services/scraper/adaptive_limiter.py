@@ -0,0 +1,91 @@
+"""
+Limite de concorrência adaptativo (AIMD) para as subpáginas de um domínio.
+
+Mesma regra do controle de congestionamento do TCP: cada sucesso soma
+`increase` ao limite, cada falha de transporte (timeout, 429, 5xx)
+multiplica por `decrease`. Um site lento recebe menos requisições em voo
+em vez de uma rajada de timeouts; um site saudável volta ao teto.
+
+Um limitador por domínio (registro do módulo, como o circuit breaker):
+filiais que compartilham o site herdam o limite já aprendido e somam suas
+subpáginas no mesmo teto.
+"""
+
+import asyncio
+from typing import Dict
+
+from app.configs.config_loader import load_config
+
+_cfg = load_config("scraper/scraper_config.json") or {}
+
+AIMD_INCREASE: float = _cfg.get("aimd_increase", 0.5)
+AIMD_DECREASE: float = _cfg.get("aimd_decrease", 0.5)
+AIMD_MIN_CONCURRENT: int = _cfg.get("aimd_min_concurrent", 1)
+AIMD_MAX_DOMAINS: int = _cfg.get("aimd_max_domains", 10000)
+
+
+class AimdLimiter:
+    """
+    Semáforo com limite ajustável entre `minimum` e `maximum`.
+    Reduzir o limite não interrompe quem já está em voo: as permissões
+    excedentes são retidas (dívida) à medida que as requisições terminam.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = AIMD_MIN_CONCURRENT,
+        increase: float = AIMD_INCREASE,
+        decrease: float = AIMD_DECREASE,
+    ):
+        self.maximum = maximum
+        self.minimum = max(1, min(minimum, maximum))
+        self.increase = increase
+        self.decrease = decrease
+        self.limit = float(maximum)
+        self._permits = maximum
+        self._debt = 0
+        self._sem = asyncio.Semaphore(maximum)
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._release()
+
+    def record(self, ok: bool) -> None:
+        if ok:
+            self.limit = min(self.maximum, self.limit + self.increase)
+        else:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+        target = int(self.limit)
+        while self._permits < target:
+            self._permits += 1
+            self._release()
+        while self._permits > target:
+            self._permits -= 1
+            self._debt += 1
+
+    def _release(self) -> None:
+        if self._debt:
+            self._debt -= 1
+        else:
+            self._sem.release()
+
+
+_limiters: Dict[str, AimdLimiter] = {}
+
+
+def get_domain_limiter(domain: str, maximum: int) -> AimdLimiter:
+    """
+    Limitador do domínio, criado no primeiro uso com teto `maximum`.
+    Registro limitado a AIMD_MAX_DOMAINS: sai o usado há mais tempo.
+    """
+    limiter = _limiters.pop(domain, None)
+    if limiter is None:
+        if len(_limiters) >= AIMD_MAX_DOMAINS:
+            _limiters.pop(next(iter(_limiters)))
+        limiter = AimdLimiter(maximum)
+    _limiters[domain] = limiter
+    return limiter
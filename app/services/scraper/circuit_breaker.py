@@ -0,0 +1,141 @@
+"""
+Circuit breaker por domínio.
+
+Domínio que acumula falhas seguidas (timeout, erro de conexão/transporte,
+429, 5xx) abre o circuito: as próximas requisições para ele falham na hora,
+sem gastar o timeout inteiro. Qualquer outra resposta HTTP (404, 410, 403,
+soft 404) é o host respondendo e conta como sucesso — links mortos de um
+site não derrubam as filiais que compartilham o domínio. Depois de `open_seconds` o circuito fica meio-aberto e
+uma requisição de teste decide se fecha de novo ou reabre.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+from app.configs.config_loader import load_config
+
+logger = logging.getLogger(__name__)
+
+_cfg = load_config("scraper/scraper_config.json") or {}
+
+CIRCUIT_FAILURE_THRESHOLD: int = _cfg.get("circuit_failure_threshold", 5)
+CIRCUIT_OPEN_SECONDS: float = _cfg.get("circuit_open_seconds", 60)
+CIRCUIT_MAX_DOMAINS: int = _cfg.get("circuit_max_domains", 10000)
+
+
+@dataclass
+class DomainState:
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    half_open: bool = False
+
+
+class DomainCircuitBreaker:
+    """Estado CLOSED → OPEN → HALF_OPEN por domínio (netloc em minúsculas)."""
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        max_domains: int = CIRCUIT_MAX_DOMAINS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_domains = max_domains
+        self._states: Dict[str, DomainState] = {}
+        self._opens_total = 0
+
+    def is_open(self, domain: str) -> bool:
+        state = self._states.get(domain)
+        if state is None or not state.opened_at:
+            return False
+        now = time.monotonic()
+        if now - state.opened_at < self.open_seconds:
+            return True
+        # Janela expirou → meio-aberto: libera uma requisição de teste e
+        # reinicia a janela (as demais seguem bloqueadas até o resultado)
+        state.opened_at = now
+        state.half_open = True
+        return False
+
+    def record_success(self, domain: str) -> None:
+        state = self._states.get(domain)
+        if state is not None:
+            del self._states[domain]
+            if state.opened_at:
+                logger.info("[CircuitBreaker] %s fechado", domain)
+
+    def record_failure(self, domain: str) -> None:
+        self._add_failures(domain, 1)
+
+    def record_bulk(self, domain: str, outcomes: Sequence[bool]) -> None:
+        """
+        Registra os resultados (True = sucesso) de um lote do mesmo domínio
+        de uma vez. Equivale a chamar record_success/record_failure em ordem:
+        só importam as falhas depois do último sucesso.
+        """
+        if not outcomes:
+            return
+        trailing = 0
+        for ok in reversed(outcomes):
+            if ok:
+                break
+            trailing += 1
+        if trailing < len(outcomes):
+            self.record_success(domain)
+        if trailing:
+            self._add_failures(domain, trailing)
+
+    def _add_failures(self, domain: str, count: int) -> None:
+        state = self._states.get(domain)
+        if state is None:
+            if len(self._states) >= self.max_domains:
+                self._states.pop(next(iter(self._states)))
+            state = self._states[domain] = DomainState()
+
+        state.consecutive_failures += count
+        if state.half_open or (
+            not state.opened_at and state.consecutive_failures >= self.failure_threshold
+        ):
+            state.opened_at = time.monotonic()
+            state.half_open = False
+            self._opens_total += 1
+            logger.info(
+                f"[CircuitBreaker] {domain} aberto por {self.open_seconds:.0f}s "
+                f"({state.consecutive_failures} falhas seguidas)"
+            )
+
+    def get_status(self) -> dict:
+        now = time.monotonic()
+        open_domains = sum(
+            1 for s in self._states.values()
+            if s.opened_at and now - s.opened_at < self.open_seconds
+        )
+        return {
+            "tracked_domains": len(self._states),
+            "open_domains": open_domains,
+            "opens_total": self._opens_total,
+            "failure_threshold": self.failure_threshold,
+            "open_seconds": self.open_seconds,
+        }
+
+
+circuit_breaker = DomainCircuitBreaker()
+
+
+def is_circuit_open(domain: str) -> bool:
+    return circuit_breaker.is_open(domain)
+
+
+def record_success(domain: str) -> None:
+    circuit_breaker.record_success(domain)
+
+
+def record_failure(domain: str) -> None:
+    circuit_breaker.record_failure(domain)
+
+
+def record_bulk(domain: str, outcomes: Sequence[bool]) -> None:
+    circuit_breaker.record_bulk(domain, outcomes)
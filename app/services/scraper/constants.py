@@ -3,8 +3,11 @@ Constantes e configurações do módulo de scraping.
 Calibrado com dados empíricos do benchmark 711Proxy (proxy_benchmark_findings.md).
 """
 
+import itertools
 import logging
 import random
+from contextvars import ContextVar
+from dataclasses import dataclass
 from typing import Optional
 from urllib.parse import urlparse
 
@@ -19,6 +22,9 @@ _cfg = load_config("scraper/scraper_config.json") or {}
 
 REQUEST_TIMEOUT: int = _cfg.get("request_timeout", 12)
 PROBE_TIMEOUT: int = _cfg.get("probe_timeout", 12)
+# Fase de conexão (proxy + túnel + TLS) dentro do timeout total: host que não
+# conecta falha aqui em vez de consumir o timeout inteiro. 0 desliga.
+CONNECT_TIMEOUT: float = _cfg.get("connect_timeout", 0)
 MAX_RETRIES: int = _cfg.get("max_retries", 1)
 RETRY_DELAY: float = _cfg.get("retry_delay", 0)
 MAX_SUBPAGES: int = _cfg.get("max_subpages", 5)
@@ -27,6 +33,75 @@ WORKERS_PER_INSTANCE: int = _cfg.get("workers_per_instance", 200)
 NUM_INSTANCES: int = _cfg.get("num_instances", 3)
 FLUSH_SIZE: int = _cfg.get("flush_size", 1000)
 MIN_CONTENT_LENGTH: int = _cfg.get("min_content_length", 100)
+# Resposta não-200 com corpo grande e sem bloqueio é aproveitada (salvage)
+SALVAGE_MIN_CONTENT: int = _cfg.get("salvage_min_content", 2000)
+# Última tentativa da main page via httpx in-process (pilha TLS diferente)
+FALLBACK_ENABLED: bool = _cfg.get("fallback_enabled", True)
+# Se a main page não respondeu em N s, dispara o fallback em paralelo (hedge).
+# 0 desliga o hedge (fallback só depois das tentativas principais).
+FALLBACK_HEDGE_DELAY: float = _cfg.get("fallback_hedge_delay", 4.0)
+# Dispara o scrape da main page (URL original) junto com o probe; aproveitado
+# se o probe confirmar a mesma URL, cancelado caso contrário
+SPECULATIVE_MAIN_SCRAPE: bool = _cfg.get("speculative_main_scrape", True)
+# HTML decodificado a partir deste tamanho é parseado numa thread (0 desliga)
+PARSE_OFFLOAD_MIN_CHARS: int = _cfg.get("parse_offload_min_chars", 200_000)
+# Orçamento por empresa (s): esgotado, nenhuma subpágina nova é iniciada e o
+# que já foi obtido é devolvido. As em voo terminam normalmente. 0 desliga.
+COMPANY_TIME_BUDGET: float = _cfg.get("company_time_budget", 0)
+# 429/503 com Retry-After pausa o host: novas requisições esperam até este
+# teto (s); pausa maior falha na hora, sem chegar a bater na origem
+RETRY_AFTER_MAX: float = _cfg.get("retry_after_max", 10)
+# Teto do corpo da resposta (bytes): o libcurl aborta o download ao passar
+# disso (CURLOPT_MAXFILESIZE) — HTML de empresa não chega perto. 0 desliga.
+MAX_BODY_BYTES: int = _cfg.get("max_body_bytes", 5 * 1024 * 1024)
+
+
+
+@dataclass(frozen=True, slots=True)
+class ScraperSettings:
+    """Snapshot imutável da configuração carregada — lido, nunca alterado."""
+    request_timeout: int
+    probe_timeout: int
+    connect_timeout: float
+    max_retries: int
+    retry_delay: float
+    max_subpages: int
+    per_domain_concurrent: int
+    workers_per_instance: int
+    num_instances: int
+    flush_size: int
+    min_content_length: int
+    salvage_min_content: int
+    fallback_enabled: bool
+    fallback_hedge_delay: float
+    speculative_main_scrape: bool
+    parse_offload_min_chars: int
+    company_time_budget: float
+    retry_after_max: float
+    max_body_bytes: int
+
+
+SCRAPER_SETTINGS = ScraperSettings(
+    request_timeout=REQUEST_TIMEOUT,
+    probe_timeout=PROBE_TIMEOUT,
+    connect_timeout=CONNECT_TIMEOUT,
+    max_retries=MAX_RETRIES,
+    retry_delay=RETRY_DELAY,
+    max_subpages=MAX_SUBPAGES,
+    per_domain_concurrent=PER_DOMAIN_CONCURRENT,
+    workers_per_instance=WORKERS_PER_INSTANCE,
+    num_instances=NUM_INSTANCES,
+    flush_size=FLUSH_SIZE,
+    min_content_length=MIN_CONTENT_LENGTH,
+    salvage_min_content=SALVAGE_MIN_CONTENT,
+    fallback_enabled=FALLBACK_ENABLED,
+    fallback_hedge_delay=FALLBACK_HEDGE_DELAY,
+    speculative_main_scrape=SPECULATIVE_MAIN_SCRAPE,
+    parse_offload_min_chars=PARSE_OFFLOAD_MIN_CHARS,
+    company_time_budget=COMPANY_TIME_BUDGET,
+    retry_after_max=RETRY_AFTER_MAX,
+    max_body_bytes=MAX_BODY_BYTES,
+)
 
 logger.info(
     f"[ScraperConfig] timeout={REQUEST_TIMEOUT}s retries={MAX_RETRIES} "
@@ -68,38 +143,76 @@ ACCEPT_LANGUAGES = [
 ]
 
 
+# RNG próprio do módulo: não compartilha estado com o `random` global e
+# sorteia índices direto (randrange) em vez de random.choice por request.
+_rng = random.Random()
+_N_PROFILES = len(BROWSER_PROFILES)
+
+
 def get_random_profile() -> dict:
-    return random.choice(BROWSER_PROFILES)
+    return BROWSER_PROFILES[_rng.randrange(_N_PROFILES)]
 
 
 def get_random_impersonate() -> str:
-    return random.choice(BROWSER_PROFILES)["impersonate"]
+    return get_random_profile()["impersonate"]
+
+
+_BASE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Cache-Control": "max-age=0",
+    "Referer": "https://www.google.com/",
+}
+
+# Templates prontos (perfil x idioma), montados uma vez no import.
+# São compartilhados entre requests — tratar como somente leitura.
+# Idioma no laço externo: templates vizinhos têm perfis (UA) diferentes.
+_HEADER_TEMPLATES = [
+    (
+        {**_BASE_HEADERS, "User-Agent": p["user_agent"], "Accept-Language": lang},
+        p["impersonate"],
+    )
+    for lang in ACCEPT_LANGUAGES
+    for p in BROWSER_PROFILES
+]
+
+# Rotação determinística em vez de sorteio: requests/empresas seguidas nunca
+# repetem o UA e não há estado de RNG no caminho quente. next() de um
+# itertools.cycle é atômico no event loop (sem lock).
+_next_template = itertools.cycle(_HEADER_TEMPLATES).__next__
+
+
+# Perfil fixado para o scrape corrente (probe + main + subpages da mesma
+# empresa). Mesmo impersonate = mesma AsyncSession do pool, então as
+# requisições ao mesmo host reaproveitam conexão/TLS em vez de cair cada uma
+# numa session diferente. Tasks filhas herdam o valor.
+_pinned_template: ContextVar[Optional[tuple]] = ContextVar("scrape_header_template", default=None)
+
+
+def pin_header_profile() -> None:
+    """Escolhe o próximo perfil da rotação e o fixa para o restante do contexto atual."""
+    _pinned_template.set(_next_template())
 
 
 def build_headers(referer: Optional[str] = None) -> tuple:
     """
-    Constrói headers dinâmicos com User-Agent variados.
+    Retorna headers dinâmicos com User-Agent variados + impersonate do perfil.
     Accept header NÃO inclui imagens — apenas text/html.
+    Sem referer, devolve um template pré-montado (sem alocar dict);
+    com referer, copia o template e sobrescreve Referer/Sec-Fetch-Site.
+    Com perfil fixado (pin_header_profile), usa sempre o mesmo template.
     """
-    profile = get_random_profile()
-    headers = {
-        "User-Agent": profile["user_agent"],
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9",
-        "Accept-Language": random.choice(ACCEPT_LANGUAGES),
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none" if not referer else "same-origin",
-        "Sec-Fetch-User": "?1",
-        "Cache-Control": "max-age=0",
-    }
+    pinned = _pinned_template.get()
+    headers, impersonate = pinned or _next_template()
     if referer:
-        headers["Referer"] = referer
-    else:
-        headers["Referer"] = "https://www.google.com/"
-    return headers, profile["impersonate"]
+        headers = {**headers, "Sec-Fetch-Site": "same-origin", "Referer": referer}
+    return headers, impersonate
 
 
 def smart_referer(subpage_url: str) -> str:
@@ -137,6 +250,12 @@ LOW_PRIORITY_KEYWORDS = [
     "login", "signin", "cart", "policy", "blog", "news", "politica-privacidade", "termos",
 ]
 
+# Status que significam bloqueio/ausência — corpo nunca é aproveitado
+BLOCKING_STATUS_CODES = frozenset({401, 403, 404, 407, 410, 429})
+
+# Assinaturas de challenge ficam no <head>/início do body: só esse trecho é varrido
+CHALLENGE_SCAN_CHARS = 8192
+
 CLOUDFLARE_SIGNATURES = [
     "just a moment...",
     "cf-browser-verification",
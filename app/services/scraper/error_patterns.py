@@ -0,0 +1,21 @@
+"""
+Classificação de mensagens de erro por regex com prioridade.
+
+Cada classificador é um único regex de alternativas em grupos nomeados; a
+ordem de declaração dos grupos é a prioridade (a mesma ordem das antigas
+cadeias de `in`). Uma passada sobre o texto em C em vez de N varreduras.
+"""
+
+import re
+from typing import Optional
+
+
+def match_by_priority(pattern: "re.Pattern", text: str) -> Optional[str]:
+    """Uma passada sobre text; retorna o grupo de maior prioridade que casou."""
+    best = None
+    for m in pattern.finditer(text):
+        if best is None or m.lastindex < best.lastindex:
+            best = m
+            if best.lastindex == 1:
+                break
+    return best.lastgroup if best else None
@@ -3,50 +3,86 @@ Parser de HTML para extração de texto e links.
 """
 
 import logging
-from typing import Tuple, Set
-from urllib.parse import urljoin, urlparse
+from functools import lru_cache
+from typing import Iterable, Tuple, Set
+from urllib.parse import urljoin, urlparse, quote
 from bs4 import BeautifulSoup
+
+try:
+    # Backend lexbor: o antigo selectolax.parser (Modest) foi removido no 1.0
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    SelectolaxParser = None
+    HAS_SELECTOLAX = False
+
 from .constants import (
     DOCUMENT_EXTENSIONS, 
     EXCLUDED_EXTENSIONS,
     CLOUDFLARE_SIGNATURES,
-    ERROR_404_KEYWORDS
+    CHALLENGE_SCAN_CHARS,
+    ERROR_404_KEYWORDS,
+    MIN_CONTENT_LENGTH,
 )
 
 logger = logging.getLogger(__name__)
 
+_DOCUMENT_SUFFIXES = tuple(DOCUMENT_EXTENSIONS)
+_EXCLUDED_SUFFIXES = tuple(EXCLUDED_EXTENSIONS)
+_IMAGE_QUERY_MARKERS = ('.png', '.jpg', '.jpeg', '.gif', '.svg')
+_HTTP_SCHEMES = ('http://', 'https://')
+_NON_TEXT_TAGS = ["script", "style", "noscript", "iframe", "svg", "path", "defs", "symbol", "use"]
+
+# Assinaturas resolvidas no import. Keywords que contêm outra keyword são
+# redundantes ("ops! página não encontrada" ⊃ "página não encontrada").
+_CF_CHALLENGE_SIGNATURES = tuple(CLOUDFLARE_SIGNATURES[:5])  # indicadores de challenge
+_SOFT_404_KEYWORDS = tuple(
+    k for k in ERROR_404_KEYWORDS
+    if not any(o != k and o in k for o in ERROR_404_KEYWORDS)
+)
+
 
 def is_cloudflare_challenge(content: str) -> bool:
     """Detecta se o conteúdo é uma página de desafio Cloudflare."""
     if not content:
         return False
     
-    content_lower = content.lower()
-    has_cloudflare = "cloudflare" in content_lower
-    has_challenge = any(
-        sig in content_lower 
-        for sig in CLOUDFLARE_SIGNATURES[:5]  # Primeiros 5 são indicadores de challenge
-    )
-    return has_cloudflare and has_challenge
+    # Só o início do documento: evita copiar/lowercase de páginas de MBs
+    head_lower = content[:CHALLENGE_SCAN_CHARS].lower()
+    if "cloudflare" not in head_lower:
+        return False
+    return any(sig in head_lower for sig in _CF_CHALLENGE_SIGNATURES)
 
 
 def is_soft_404(text: str) -> bool:
     """Detecta 'soft 404s' (páginas de erro com status 200)."""
     if len(text) > 1000:
         return False
-        
+
+    # Uma varredura por keyword; páginas curtas também caem com "not found" solto
     lower_text = text.lower()
-    
-    if len(text) < 200 and ("found" in lower_text or "erro" in lower_text or "página" in lower_text):
-        if any(k in lower_text for k in ERROR_404_KEYWORDS) or "not found" in lower_text:
-            return True
-            
-    return any(k in lower_text for k in ERROR_404_KEYWORDS)
+    if any(k in lower_text for k in _SOFT_404_KEYWORDS):
+        return True
+    return len(text) < 200 and "not found" in lower_text
+
+
+def is_usable_content(text: str) -> bool:
+    """
+    Texto utilizável: tamanho mínimo, sem soft 404 e sem challenge Cloudflare.
+    Checagens em ordem de custo — o tamanho descarta antes de qualquer varredura.
+    """
+    return (
+        len(text) >= MIN_CONTENT_LENGTH
+        and not is_soft_404(text)
+        and not is_cloudflare_challenge(text)
+    )
 
 
 def parse_html(html: str, url: str) -> Tuple[str, Set[str], Set[str]]:
     """
     Extrai texto limpo e links do HTML.
+    Com selectolax instalado, texto e links saem do parser em C; se ele não
+    estiver disponível ou falhar na página, cai no BeautifulSoup.
     
     Args:
         html: Conteúdo HTML da página
@@ -55,6 +91,26 @@ def parse_html(html: str, url: str) -> Tuple[str, Set[str], Set[str]]:
     Returns:
         Tuple de (texto_limpo, links_documentos, links_internos)
     """
+    if HAS_SELECTOLAX:
+        try:
+            return _parse_html_selectolax(html, url)
+        except Exception as e:
+            logger.debug("selectolax falhou em %s, usando BeautifulSoup: %s", url, e)
+    return _parse_html_bs4(html, url)
+
+
+def _parse_html_selectolax(html: str, url: str) -> Tuple[str, Set[str], Set[str]]:
+    tree = SelectolaxParser(html)
+    tree.strip_tags(_NON_TEXT_TAGS)
+    root = tree.root
+    text = root.text(separator='\n\n') if root is not None else ""
+    documents, internal = _classify_hrefs(
+        [node.attributes.get('href') or '' for node in tree.css('a[href]')], url
+    )
+    return _clean_text(text), documents, internal
+
+
+def _parse_html_bs4(html: str, url: str) -> Tuple[str, Set[str], Set[str]]:
     try:
         try:
             soup = BeautifulSoup(html, 'lxml')
@@ -62,24 +118,30 @@ def parse_html(html: str, url: str) -> Tuple[str, Set[str], Set[str]]:
             soup = BeautifulSoup(html, 'html.parser')
             
         # Remover elementos não textuais
-        for tag in soup(["script", "style", "noscript", "iframe", "svg", "path", "defs", "symbol", "use"]): 
+        for tag in soup(_NON_TEXT_TAGS): 
             tag.extract()
             
         text = soup.get_text(separator='\n\n')
-        lines = [line.strip() for line in text.splitlines()]
-        clean_text = '\n'.join(line for line in lines if line)
         
-        documents, internal = extract_links(str(soup), url)
-        return clean_text, documents, internal
+        # Links da mesma árvore já parseada — sem serializar e parsear de novo
+        documents, internal = _links_from_soup(soup, url)
+        return _clean_text(text), documents, internal
         
     except Exception as e:
-        logger.error(f"Erro no parsing HTML de {url}: {e}")
+        logger.error("Erro no parsing HTML de %s: %s", url, e)
         return "", set(), set()
 
 
+def _clean_text(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines()]
+    return '\n'.join(line for line in lines if line)
+
+
 def extract_links(html: str, base_url: str) -> Tuple[Set[str], Set[str]]:
     """
     Extrai links de documentos e links internos do HTML.
+    Com selectolax instalado, só os <a href> são lidos por um parser em C;
+    sem ele, cai no BeautifulSoup.
     
     Args:
         html: Conteúdo HTML
@@ -88,18 +150,37 @@ def extract_links(html: str, base_url: str) -> Tuple[Set[str], Set[str]]:
     Returns:
         Tuple de (links_documentos, links_internos)
     """
+    try:
+        if HAS_SELECTOLAX:
+            hrefs = [
+                node.attributes.get('href') or ''
+                for node in SelectolaxParser(html).css('a[href]')
+            ]
+        else:
+            soup = BeautifulSoup(html, 'html.parser')
+            hrefs = [a['href'] for a in soup.find_all('a', href=True)]
+    except:
+        return set(), set()
+    return _classify_hrefs(hrefs, base_url)
+
+
+def _links_from_soup(soup: BeautifulSoup, base_url: str) -> Tuple[Set[str], Set[str]]:
+    """Classifica os <a href> de uma árvore já parseada (ver extract_links)."""
+    return _classify_hrefs((a['href'] for a in soup.find_all('a', href=True)), base_url)
+
+
+def _classify_hrefs(hrefs: Iterable[str], base_url: str) -> Tuple[Set[str], Set[str]]:
+    """Resolve hrefs contra base_url e separa documentos de links internos."""
     documents: Set[str] = set()
     internal: Set[str] = set()
     
     try:
-        soup = BeautifulSoup(html, 'html.parser')
-        base_domain = urlparse(base_url).netloc
+        base_domain = url_host(base_url)
+        base_no_frag = base_url.split('#')[0]
         
-        for a in soup.find_all('a', href=True):
-            href = a['href'].strip()
-            
+        for href in hrefs:
             # Remover vírgulas finais (bug identificado)
-            href = href.rstrip(',')
+            href = href.strip().rstrip(',')
             
             if href.startswith('#') or href.lower().startswith('javascript:'):
                 continue
@@ -109,21 +190,18 @@ def extract_links(html: str, base_url: str) -> Tuple[Set[str], Set[str]]:
             # Remover vírgula final do URL completo também
             full = full.rstrip(',')
             
-            if '#' in full:
-                full_no_frag = full.split('#')[0]
-                base_no_frag = base_url.split('#')[0]
-                if full_no_frag == base_no_frag:
-                    continue
-
-            parsed = urlparse(full)
-            path_lower = parsed.path.lower()
+            if '#' in full and full.split('#')[0] == base_no_frag:
+                continue
+
+            netloc, path_lower, query_lower = url_parts_lower(full)
             
-            if any(path_lower.endswith(ext) for ext in DOCUMENT_EXTENSIONS):
+            if path_lower.endswith(_DOCUMENT_SUFFIXES):
                 documents.add(full)
-            elif any(path_lower.endswith(ext) for ext in EXCLUDED_EXTENSIONS):
+            elif path_lower.endswith(_EXCLUDED_SUFFIXES):
                 continue
-            elif parsed.netloc == base_domain:
-                if not any(ext in parsed.query.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg']):
+            elif netloc == base_domain and full[:8].lower().startswith(_HTTP_SCHEMES):
+                # Mesmo host mas outro esquema (ftp://, ws://) não vira subpágina
+                if not any(ext in query_lower for ext in _IMAGE_QUERY_MARKERS):
                     internal.add(full)
     except:
         pass
@@ -131,13 +209,30 @@ def extract_links(html: str, base_url: str) -> Tuple[Set[str], Set[str]]:
     return documents, internal
 
 
+@lru_cache(maxsize=4096)
+def url_host(url: str) -> str:
+    """Host (netloc em minúsculas) da URL — cacheado, a mesma URL é consultada várias vezes por scrape."""
+    return urlparse(url).netloc.lower()
+
+
+@lru_cache(maxsize=16384)
+def url_parts_lower(url: str) -> Tuple[str, str, str]:
+    """
+    (netloc, path, query) da URL em minúsculas — cacheado. O mesmo link é
+    parseado na extração (_classify_hrefs), no filtro e na priorização
+    (link_selector); com o cache, o urlparse roda uma vez por link.
+    """
+    parsed = urlparse(url)
+    return parsed.netloc.lower(), parsed.path.lower(), parsed.query.lower()
+
+
+@lru_cache(maxsize=16384)
 def normalize_url(url: str) -> str:
     """
     Normaliza URL removendo caracteres problemáticos.
     Corrige bug com vírgulas finais que causavam falhas.
+    Função pura — cacheada, pois as mesmas URLs se repetem entre retries e batches.
     """
-    from urllib.parse import urlparse, quote
-    
     try:
         url = url.strip()
         
@@ -191,6 +286,6 @@ def normalize_url(url: str) -> str:
         return normalized
         
     except Exception as e:
-        logger.warning(f"Erro ao normalizar URL {url}: {e}")
+        logger.warning("Erro ao normalizar URL %s: %s", url, e)
         return url.strip().rstrip(',')
 
@@ -1,6 +1,6 @@
 """
 Cliente HTTP para scraping usando curl_cffi.
-Session compartilhada + semáforo global de 2000 requests simultâneos.
+Pool de sessions persistentes por (proxy, impersonate) + semáforo global de 2000 requests simultâneos.
 Stress test provou: proxy aguenta 2000 conns (83.8% sucesso), acima degrada.
 """
 
@@ -8,18 +8,82 @@ import asyncio
 import logging
 import re
 import os
-import random
-from typing import Tuple, Set, Optional, List
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Tuple, Set, Optional
 
 try:
+    from curl_cffi import CurlOpt
     from curl_cffi.requests import AsyncSession
     HAS_CURL_CFFI = True
 except ImportError:
     HAS_CURL_CFFI = False
     AsyncSession = None
+    CurlOpt = None
 
-from .constants import REQUEST_TIMEOUT, build_headers, BROWSER_PROFILES
-from .html_parser import parse_html
+# Exceções de timeout de transporte (curl_cffi >= 0.6 expõe Timeout próprio)
+try:
+    from curl_cffi.requests.exceptions import Timeout as _CurlTimeout
+    TIMEOUT_ERRORS: Tuple[type, ...] = (TimeoutError, _CurlTimeout)
+except ImportError:
+    TIMEOUT_ERRORS = (TimeoutError,)
+
+class HTTPStatusError(Exception):
+    """Resposta não-200 em cffi_scrape (o caminho que propaga exceções)."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Status {status_code}")
+        self.status_code = status_code
+
+
+def is_host_failure_status(status_code: int) -> bool:
+    """
+    Status que indica host sobrecarregado/com problema (429, 5xx). Os demais
+    (404, 410, 403...) são resposta do host: não contam como falha para o
+    circuit breaker nem para o limite adaptativo.
+    """
+    return status_code == 429 or status_code >= 500
+
+
+# Corpo acima de MAX_BODY_BYTES: o host respondeu, mas a página é descartada.
+# Erro terminal — não é falha de transporte, não vale retry nem fallback.
+BODY_TOO_LARGE = "body_too_large"
+
+# Erros do libcurl viram um rótulo fixo pelo código (curl_couldnt_resolve_host,
+# ...): sem formatar a mensagem da exceção a cada falha
+try:
+    from curl_cffi import CurlError as _CurlError, CurlECode as _CurlECode
+    CURL_ERRORS: Tuple[type, ...] = (_CurlError,)
+    _CURL_ERROR_LABELS: Dict[int, str] = {
+        int(code): f"curl_{code.name.lower()}" for code in _CurlECode if code
+    }
+    # Teto de corpo (CURLOPT_MAXFILESIZE) tem o mesmo rótulo em todo caminho
+    _CURL_ERROR_LABELS[int(_CurlECode.FILESIZE_EXCEEDED)] = "body_too_large"
+except ImportError:
+    CURL_ERRORS = ()
+    _CURL_ERROR_LABELS = {}
+
+
+def curl_error_label(e: Exception) -> str:
+    """Rótulo do erro do libcurl pelo código; código desconhecido vira curl_<n>."""
+    code = int(getattr(e, "code", 0) or 0)
+    if not code:
+        return "curl_error"
+    return _CURL_ERROR_LABELS.get(code) or f"curl_{code}"
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+    httpx = None
+
+from .constants import (
+    REQUEST_TIMEOUT, CONNECT_TIMEOUT, MIN_CONTENT_LENGTH, SALVAGE_MIN_CONTENT, BLOCKING_STATUS_CODES,
+    PARSE_OFFLOAD_MIN_CHARS, RETRY_AFTER_MAX, MAX_BODY_BYTES, build_headers, get_random_impersonate,
+)
+from .html_parser import parse_html, is_cloudflare_challenge, url_host
+from .error_patterns import match_by_priority
 
 logger = logging.getLogger(__name__)
 
@@ -32,60 +96,211 @@ _CHARSET_CONTENT_TYPE_REGEX = re.compile(
     rb'<meta[^>]+content=["\'][^"\']*charset=([^"\'\s;]+)', re.IGNORECASE
 )
 
+def _get_proxy() -> str:
+    return _PROXY_URL
+
+
 # ---------------------------------------------------------------------------
-# Session compartilhada + semáforo global
+# Pool de sessions persistentes + semáforo global
+# Uma AsyncSession por (proxy, impersonate), criada sob demanda e reutilizada
+# pelo processo inteiro: conexões/TLS ficam no pool do libcurl em vez de
+# serem refeitas a cada batch. O impersonate da session casa com o
+# User-Agent dos headers (fingerprint TLS coerente com o UA).
 # Proxy aguenta ~2000 conexões simultâneas (validado por stress test).
 # Semáforo garante que nunca ultrapassamos esse limite, independente de
 # quantos workers existam (2000 workers x 20 requests = 40k sem semáforo).
 # ---------------------------------------------------------------------------
 _MAX_CLIENTS = 3000
 _MAX_CONCURRENT_REQUESTS = 2000
-_sessions: List = []
-_semaphore: Optional[asyncio.Semaphore] = None
-_init_done = False
+_sessions: Dict[Tuple[str, str], "AsyncSession"] = {}
+_semaphore: Optional["_InFlightSemaphore"] = None
 
+# Versão HTTP negociada por resposta (CURLINFO_HTTP_VERSION). O impersonate
+# já pede h2 via ALPN e o libcurl multiplexa streams na mesma conexão; a
+# contagem confirma em produção quanto do tráfego sai em h2.
+_HTTP_VERSION_LABELS = {1: "http/1.0", 2: "http/1.1", 3: "h2", 30: "h3"}
+_http_versions: Dict[str, int] = {}
 
-def _ensure_sessions():
-    """Cria sessions compartilhadas e semáforo global (lazy, uma vez só)."""
-    global _sessions, _semaphore, _init_done
-    if _init_done:
-        return
+
+def _count_http_version(resp) -> None:
+    label = _HTTP_VERSION_LABELS.get(getattr(resp, "http_version", 0), "other")
+    _http_versions[label] = _http_versions.get(label, 0) + 1
+
+
+def _session_curl_options() -> Optional[dict]:
+    """Opções extras do libcurl para toda session do pool (teto de corpo)."""
+    if MAX_BODY_BYTES:
+        return {CurlOpt.MAXFILESIZE_LARGE: MAX_BODY_BYTES}
+    return None
+
+
+def get_shared_session(
+    impersonate: Optional[str] = None,
+    proxy: Optional[str] = None,
+) -> "AsyncSession":
+    """
+    Retorna a session persistente de (proxy, impersonate), criando na 1ª vez.
+    Sem impersonate, sorteia um perfil (fingerprint rotation).
+    """
     if not HAS_CURL_CFFI:
-        _init_done = True
+        raise RuntimeError("curl_cffi não disponível ou sessions não inicializadas")
+
+    if impersonate is None:
+        impersonate = get_random_impersonate()
+    proxy_url = proxy if proxy is not None else _get_proxy()
+    key = (proxy_url, impersonate)
+
+    session = _sessions.get(key)
+    if session is None:
+        session = AsyncSession(
+            impersonate=impersonate, proxy=proxy_url or None,
+            verify=False, max_clients=_MAX_CLIENTS,
+            curl_options=_session_curl_options(),
+        )
+        _sessions[key] = session
+        logger.info(f"[http_client] Nova session impersonate={impersonate} (pool={len(_sessions)})")
+    return session
+
+
+# ---------------------------------------------------------------------------
+# Pausa por host (Retry-After)
+# 429/503 com Retry-After marca o host como pausado até o prazo indicado:
+# as próximas requisições para ele esperam (até RETRY_AFTER_MAX) em vez de
+# bater de novo na origem e receber outro 429.
+# ---------------------------------------------------------------------------
+_RATE_LIMIT_STATUS = frozenset({429, 503})
+_MAX_PAUSED_HOSTS = 10000
+_host_paused_until: Dict[str, float] = {}
+
+
+def _retry_after_seconds(value: Optional[str]) -> float:
+    """Retry-After em segundos (aceita inteiro ou HTTP-date); 0 se ausente/inválido."""
+    if not value:
+        return 0.0
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _note_rate_limit(url: str, resp) -> None:
+    if resp.status_code not in _RATE_LIMIT_STATUS:
+        return
+    delay = _retry_after_seconds(resp.headers.get("retry-after"))
+    if delay <= 0:
         return
+    host = url_host(url)
+    until = time.monotonic() + delay
+    if until > _host_paused_until.get(host, 0.0):
+        if host not in _host_paused_until and len(_host_paused_until) >= _MAX_PAUSED_HOSTS:
+            _host_paused_until.pop(next(iter(_host_paused_until)))
+        _host_paused_until[host] = until
+        logger.debug("[http_client] %s pausado por %.0fs (Retry-After)", host, delay)
+
+
+async def _wait_host_pause(url: str) -> bool:
+    """
+    Espera a pausa do host, se houver. False se a pausa passa de
+    RETRY_AFTER_MAX: o chamador trata como 429 sem fazer a requisição.
+    """
+    if not _host_paused_until:
+        return True
+    host = url_host(url)
+    until = _host_paused_until.get(host)
+    if until is None:
+        return True
+    wait = until - time.monotonic()
+    if wait <= 0:
+        _host_paused_until.pop(host, None)
+        return True
+    if wait > RETRY_AFTER_MAX:
+        return False
+    await asyncio.sleep(wait)
+    return True
 
-    profiles = ["chrome131", "chrome124", "safari17_0", "chrome120", "edge101"]
-    for p in profiles:
-        s = AsyncSession(impersonate=p, verify=False, max_clients=_MAX_CLIENTS)
-        _sessions.append(s)
 
-    _semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+def split_timeout(total: float):
+    """
+    Timeout do curl_cffi com a conexão limitada a CONNECT_TIMEOUT: a tupla
+    (connect, read) vira CONNECTTIMEOUT + TIMEOUT total = connect + read,
+    então o teto total continua `total`.
+    """
+    if 0 < CONNECT_TIMEOUT < total:
+        return (CONNECT_TIMEOUT, total - CONNECT_TIMEOUT)
+    return total
 
-    logger.info(
-        f"[http_client] {len(_sessions)} sessions | "
-        f"semaphore={_MAX_CONCURRENT_REQUESTS} max concurrent requests"
-    )
-    _init_done = True
 
+class _InFlightSemaphore:
+    """
+    asyncio.Semaphore com contador explícito de quem está dentro do
+    `async with` — o /status lê `in_flight` em vez do `_value` privado.
+    """
 
-def get_shared_session() -> "AsyncSession":
-    """Retorna session compartilhada aleatória (fingerprint rotation)."""
-    _ensure_sessions()
-    if not _sessions:
-        raise RuntimeError("curl_cffi não disponível ou sessions não inicializadas")
-    return random.choice(_sessions)
+    def __init__(self, limit: int):
+        self._sem = asyncio.Semaphore(limit)
+        self.in_flight = 0
+
+    def locked(self) -> bool:
+        return self._sem.locked()
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        self.in_flight += 1
+        return self
 
+    async def __aexit__(self, *exc) -> None:
+        self.in_flight -= 1
+        self._sem.release()
 
-def get_semaphore() -> asyncio.Semaphore:
-    """Retorna semáforo global de requests."""
-    _ensure_sessions()
+
+def get_semaphore() -> _InFlightSemaphore:
+    """Retorna semáforo global de requests (lazy, criado uma vez só)."""
+    global _semaphore
     if _semaphore is None:
-        return asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+        _semaphore = _InFlightSemaphore(_MAX_CONCURRENT_REQUESTS)
+        logger.info(f"[http_client] semaphore={_MAX_CONCURRENT_REQUESTS} max concurrent requests")
     return _semaphore
 
 
-def _get_proxy() -> str:
-    return _PROXY_URL
+def get_pool_status() -> dict:
+    """Estado do pool de sessions e da ocupação dos semáforos (para /status)."""
+    in_flight = _semaphore.in_flight if _semaphore else 0
+    fallback_in_flight = _fallback_semaphore.in_flight if _fallback_semaphore else 0
+    return {
+        "sessions": len(_sessions),
+        "impersonates": sorted({imp for _, imp in _sessions}),
+        "in_flight": in_flight,
+        "max_concurrent": _MAX_CONCURRENT_REQUESTS,
+        "fallback_client_open": _fallback_client is not None and not _fallback_client.is_closed,
+        "fallback_in_flight": fallback_in_flight,
+        "fallback_max_concurrent": _FALLBACK_MAX_CONCURRENT,
+        "http_versions": dict(_http_versions),
+        "paused_hosts": len(_host_paused_until),
+    }
+
+
+async def close_sessions() -> None:
+    """Fecha todas as sessions do pool (shutdown da aplicação)."""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        try:
+            await session.close()
+        except Exception as e:
+            logger.debug(f"[http_client] Erro ao fechar session: {e}")
+    if sessions:
+        logger.info(f"[http_client] {len(sessions)} sessions fechadas")
+
+    global _fallback_client
+    if _fallback_client is not None:
+        client, _fallback_client = _fallback_client, None
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.debug(f"[http_client] Erro ao fechar fallback: {e}")
 
 
 def _detect_encoding(content: bytes, content_type: Optional[str] = None) -> str:
@@ -146,69 +361,271 @@ async def cffi_scrape(
     if not HAS_CURL_CFFI:
         raise RuntimeError("curl_cffi não está instalado")
 
-    headers, _ = build_headers()
-    proxy_url = proxy or _get_proxy()
-    req_timeout = timeout or REQUEST_TIMEOUT
+    if not await _wait_host_pause(url):
+        raise HTTPStatusError(429)
+
+    headers, impersonate = build_headers()
+    req_timeout = split_timeout(timeout or REQUEST_TIMEOUT)
     sem = get_semaphore()
 
     async with sem:
-        session = get_shared_session()
+        session = get_shared_session(impersonate, proxy)
         resp = await session.get(
-            url, headers=headers, proxy=proxy_url,
+            url, headers=headers,
             timeout=req_timeout, allow_redirects=True, max_redirects=5,
         )
+    _count_http_version(resp)
+    _note_rate_limit(url, resp)
 
     if resp.status_code != 200:
-        raise Exception(f"Status {resp.status_code}")
+        raise HTTPStatusError(resp.status_code)
+
+    # Corpo menor que o mínimo nunca vira página válida: nem decodifica/parseia
+    if len(resp.content) < MIN_CONTENT_LENGTH:
+        return "", set(), set()
 
     content_type = resp.headers.get('content-type', '')
     text = _decode_content(resp.content, content_type)
+    return await _parse_page(text, url)
+
+
+async def _parse_page(text: str, url: str) -> Tuple[str, Set[str], Set[str]]:
+    """
+    parse_html no event loop para páginas comuns; acima de
+    PARSE_OFFLOAD_MIN_CHARS vai para o pool de threads, para uma página de
+    MBs não travar as demais requisições (o parse do selectolax solta o GIL).
+    """
+    if PARSE_OFFLOAD_MIN_CHARS and len(text) >= PARSE_OFFLOAD_MIN_CHARS:
+        return await asyncio.to_thread(parse_html, text, url)
     return parse_html(text, url)
 
 
+async def _read_response(fn, url: str, status: int, body: bytes, content_type: str):
+    """
+    Converte uma resposta HTTP em (text, docs, links) e anota fn.last_status /
+    fn.last_error. Comum ao cliente principal e ao fallback.
+    Os atributos são escritos só no fim, depois do parse: chamadas
+    concorrentes da mesma função não sobrescrevem o resultado desta antes
+    de o chamador lê-lo.
+    """
+    error = None
+    text = None
+    if status != 200:
+        # Salvage: status "cinza" (2xx/3xx/5xx) com HTML substancial e sem
+        # challenge é usado como está, em vez de pagar outra tentativa
+        if status in BLOCKING_STATUS_CODES or len(body) < SALVAGE_MIN_CONTENT:
+            error = f"http_{status}"
+        else:
+            text = _decode_content(body, content_type)
+            if len(text) < SALVAGE_MIN_CONTENT or is_cloudflare_challenge(text):
+                error = f"http_{status}"
+                text = None
+    # Texto limpo nunca é maior que o corpo: abaixo do mínimo em bytes a página
+    # seria descartada de qualquer forma — pula decode + parse
+    elif len(body) < MIN_CONTENT_LENGTH:
+        error = "thin_body"
+    else:
+        text = _decode_content(body, content_type)
+
+    result = await _parse_page(text, url) if text is not None else ("", set(), set())
+    fn.last_status = status
+    fn.last_error = error
+    return result
+
+
+_TRANSPORT_ERROR_PATTERN = re.compile(
+    r"(?P<proxy_timeout>timeout|timed out)"
+    r"|(?P<proxy_connection_error>connect|refused)"
+    r"|(?P<ssl_error>ssl)"
+    r"|(?P<body_too_large>maximum (?:allowed )?file size)",
+    re.IGNORECASE,
+)
+
+
+def _transport_error(e: Exception) -> str:
+    err_msg = str(e)
+    return (
+        match_by_priority(_TRANSPORT_ERROR_PATTERN, err_msg)
+        or f"{type(e).__name__}:{err_msg[:30]}"
+    )
+
+
 async def cffi_scrape_safe(
     url: str,
     proxy: Optional[str] = None,
     timeout: Optional[int] = None,
 ) -> Tuple[str, Set[str], Set[str]]:
-    """Versão safe com semáforo global — não propaga exceções."""
+    """
+    Versão safe com semáforo global — não propaga exceções.
+    Após o retorno, `last_error`/`last_status` descrevem a resposta
+    (status 0 = falha de transporte, sem resposta HTTP).
+    """
     cffi_scrape_safe.last_error = None
+    cffi_scrape_safe.last_status = 0
     if not HAS_CURL_CFFI:
         cffi_scrape_safe.last_error = "no_curl_cffi"
         return "", set(), set()
 
     try:
-        headers, _ = build_headers()
-        proxy_url = proxy or _get_proxy()
-        req_timeout = timeout or REQUEST_TIMEOUT
+        if not await _wait_host_pause(url):
+            cffi_scrape_safe.last_status = 429
+            cffi_scrape_safe.last_error = "http_429"
+            return "", set(), set()
+
+        headers, impersonate = build_headers()
+        req_timeout = split_timeout(timeout or REQUEST_TIMEOUT)
         sem = get_semaphore()
 
         async with sem:
-            session = get_shared_session()
+            session = get_shared_session(impersonate, proxy)
             resp = await session.get(
-                url, headers=headers, proxy=proxy_url,
+                url, headers=headers,
                 timeout=req_timeout, allow_redirects=True, max_redirects=5,
             )
+        _count_http_version(resp)
+        _note_rate_limit(url, resp)
 
-        if resp.status_code != 200:
-            cffi_scrape_safe.last_error = f"http_{resp.status_code}"
+        return await _read_response(
+            cffi_scrape_safe, url, resp.status_code, resp.content,
+            resp.headers.get('content-type', ''),
+        )
+
+    except Exception as e:
+        # Reescreve os dois: outra chamada pode tê-los alterado durante o await
+        cffi_scrape_safe.last_status = 0
+        cffi_scrape_safe.last_error = _transport_error(e)
+        return "", set(), set()
+
+
+cffi_scrape_safe.last_error = None
+cffi_scrape_safe.last_status = 0
+
+
+# ---------------------------------------------------------------------------
+# Fallback in-process (httpx)
+# Pilha TLS diferente do libcurl: cobre falhas de transporte do curl_cffi e
+# ambientes sem curl_cffi. Um único AsyncClient com keep-alive para o processo
+# todo — nada de processo/handshake novo por URL.
+# ---------------------------------------------------------------------------
+_FALLBACK_MAX_CONNECTIONS = 500
+# Bulkhead: fallbacks em voo são limitados à parte. Cheio = falha na hora
+# (o fallback é opcional) em vez de enfileirar atrás do proxy saturado.
+_FALLBACK_MAX_CONCURRENT = 200
+_fallback_client: Optional["httpx.AsyncClient"] = None
+_fallback_semaphore: Optional[_InFlightSemaphore] = None
+
+
+def _httpx_timeout(total: float) -> "httpx.Timeout":
+    """
+    Mesmo split do split_timeout para o httpx: conexão limitada a
+    CONNECT_TIMEOUT, o resto para leitura — host morto falha rápido
+    também no fallback.
+    """
+    split = split_timeout(total)
+    if isinstance(split, tuple):
+        connect, read = split
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(split)
+
+
+def get_fallback_client() -> "httpx.AsyncClient":
+    """Retorna o AsyncClient do fallback (lazy, criado uma vez só)."""
+    global _fallback_client
+    if not HAS_HTTPX:
+        raise RuntimeError("httpx não está instalado")
+    if _fallback_client is None or _fallback_client.is_closed:
+        _fallback_client = httpx.AsyncClient(
+            proxy=_get_proxy() or None,
+            verify=False,
+            follow_redirects=True,
+            max_redirects=5,
+            timeout=_httpx_timeout(REQUEST_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=_FALLBACK_MAX_CONNECTIONS,
+                max_keepalive_connections=_FALLBACK_MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+        )
+        logger.info(f"[http_client] Fallback httpx criado (pool={_FALLBACK_MAX_CONNECTIONS})")
+    return _fallback_client
+
+
+def get_fallback_semaphore() -> _InFlightSemaphore:
+    """Retorna o bulkhead do fallback (lazy, criado uma vez só)."""
+    global _fallback_semaphore
+    if _fallback_semaphore is None:
+        _fallback_semaphore = _InFlightSemaphore(_FALLBACK_MAX_CONCURRENT)
+    return _fallback_semaphore
+
+
+async def _read_capped(resp) -> Optional[bytes]:
+    """
+    Lê o corpo do httpx em streaming com o mesmo teto do libcurl
+    (MAX_BODY_BYTES). None se passar do teto: o resto nem é baixado.
+    """
+    if not MAX_BODY_BYTES:
+        return await resp.aread()
+    declared = resp.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_BODY_BYTES:
+        return None
+    chunks = []
+    size = 0
+    async for chunk in resp.aiter_bytes():
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def fallback_scrape_safe(
+    url: str,
+    timeout: Optional[int] = None,
+) -> Tuple[str, Set[str], Set[str]]:
+    """
+    Mesmo contrato de cffi_scrape_safe (não propaga exceções, anota
+    `last_error`/`last_status`), mas via httpx in-process. Conta no semáforo
+    global do proxy e no bulkhead próprio do fallback.
+    """
+    fallback_scrape_safe.last_error = None
+    fallback_scrape_safe.last_status = 0
+    if not HAS_HTTPX:
+        fallback_scrape_safe.last_error = "no_httpx"
+        return "", set(), set()
+
+    bulkhead = get_fallback_semaphore()
+    if bulkhead.locked():
+        fallback_scrape_safe.last_error = "fallback_saturated"
+        return "", set(), set()
+
+    try:
+        headers, _ = build_headers()
+        # httpx só decodifica br com o pacote brotli instalado
+        headers = {**headers, "Accept-Encoding": "gzip, deflate"}
+        client = get_fallback_client()
+        async with bulkhead, get_semaphore():
+            async with client.stream(
+                "GET", url, headers=headers,
+                timeout=_httpx_timeout(timeout or REQUEST_TIMEOUT),
+            ) as resp:
+                body = await _read_capped(resp)
+                status = resp.status_code
+                content_type = resp.headers.get('content-type', '')
+
+        if body is None:
+            fallback_scrape_safe.last_status = 0
+            fallback_scrape_safe.last_error = BODY_TOO_LARGE
             return "", set(), set()
 
-        content_type = resp.headers.get('content-type', '')
-        text = _decode_content(resp.content, content_type)
-        return parse_html(text, url)
+        return await _read_response(
+            fallback_scrape_safe, url, status, body, content_type,
+        )
 
     except Exception as e:
-        err_msg = str(e).lower()
-        if "timeout" in err_msg or "timed out" in err_msg:
-            cffi_scrape_safe.last_error = "proxy_timeout"
-        elif "connect" in err_msg or "refused" in err_msg:
-            cffi_scrape_safe.last_error = "proxy_connection_error"
-        elif "ssl" in err_msg:
-            cffi_scrape_safe.last_error = "ssl_error"
-        else:
-            cffi_scrape_safe.last_error = f"{type(e).__name__}:{str(e)[:30]}"
+        fallback_scrape_safe.last_status = 0
+        fallback_scrape_safe.last_error = _transport_error(e)
         return "", set(), set()
 
 
-cffi_scrape_safe.last_error = None
+fallback_scrape_safe.last_error = None
+fallback_scrape_safe.last_status = 0
@@ -3,35 +3,39 @@ Seleção de links para scraping de subpáginas — apenas heurísticas.
 """
 
 import logging
-from typing import List, Set
-from urllib.parse import urlparse
+from typing import Iterable, List, Set
 
 from .constants import (
     DOCUMENT_EXTENSIONS, EXCLUDED_EXTENSIONS,
-    ASSET_DIRECTORIES, HIGH_PRIORITY_KEYWORDS, LOW_PRIORITY_KEYWORDS,
+    HIGH_PRIORITY_KEYWORDS, LOW_PRIORITY_KEYWORDS,
 )
+from .html_parser import url_parts_lower
 
 logger = logging.getLogger(__name__)
 
 
-def filter_non_html_links(links: Set[str]) -> Set[str]:
-    """Filtra links não-HTML (documentos, imagens, assets estáticos)."""
+# str.endswith aceita tupla: uma chamada em C em vez de any() por extensão
+_NON_HTML_SUFFIXES = tuple(DOCUMENT_EXTENSIONS | EXCLUDED_EXTENSIONS)
+_IMAGE_QUERY_MARKERS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')
+
+
+def filter_non_html_links(links: Iterable[str]) -> Set[str]:
+    """
+    Filtra links não-HTML (documentos, imagens, assets estáticos).
+    Aceita qualquer iterável (lista com duplicatas inclusive) — o set de
+    saída já deduplica, sem precisar materializar um set de entrada.
+    """
     filtered = set()
     for link in links:
         link = link.strip().rstrip(',')
-        if not link:
+        if not link or link in filtered:
             continue
-        parsed = urlparse(link)
-        path_lower = parsed.path.lower()
+        _, path_lower, query_lower = url_parts_lower(link)
 
-        if any(path_lower.endswith(ext) for ext in DOCUMENT_EXTENSIONS):
-            continue
-        if any(path_lower.endswith(ext) for ext in EXCLUDED_EXTENSIONS):
-            continue
-        if any(ext in parsed.query.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp']):
+        if path_lower.endswith(_NON_HTML_SUFFIXES):
             continue
-        if any(d in path_lower for d in ASSET_DIRECTORIES):
-            if any(path_lower.endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico']):
+        if query_lower:
+            if any(ext in query_lower for ext in _IMAGE_QUERY_MARKERS):
                 continue
         filtered.add(link)
     return filtered
@@ -39,10 +43,13 @@ def filter_non_html_links(links: Set[str]) -> Set[str]:
 
 def prioritize_links(links: Set[str], base_url: str) -> List[str]:
     """Prioriza links por relevância usando heurísticas de keywords."""
+    if not links:
+        return []
+    base = base_url.rstrip('/')
     scored = []
     for link in links:
         link = link.strip().rstrip(',')
-        if not link or link.rstrip('/') == base_url.rstrip('/'):
+        if not link or link.rstrip('/') == base:
             continue
         score = 0
         lower = link.lower()
@@ -52,7 +59,7 @@ def prioritize_links(links: Set[str], base_url: str) -> List[str]:
         if any(k in lower for k in HIGH_PRIORITY_KEYWORDS):
             score += 50
 
-        score -= len(urlparse(link).path.split('/'))
+        score -= url_parts_lower(link)[1].count('/') + 1
 
         if any(x in lower for x in ["page", "p=", "pagina", "nav"]):
             if not any(k in lower for k in LOW_PRIORITY_KEYWORDS):
@@ -3,16 +3,21 @@ Modelos de dados para o módulo de scraping.
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict
+from typing import Collection, Optional, List, Dict
 
 
-@dataclass
+@dataclass(slots=True)
 class ScrapedPage:
-    """Resultado do scrape de uma página."""
+    """
+    Resultado do scrape de uma página.
+    slots: um objeto por URL (milhões num batch grande) — sem __dict__ por instância.
+    """
     url: str
     content: str
-    links: List[str] = field(default_factory=list)
-    document_links: List[str] = field(default_factory=list)
+    # Sets vindos do parse_html são guardados como estão (sem cópia para list).
+    # Default é a tupla vazia compartilhada: página de erro não aloca listas.
+    links: Collection[str] = ()
+    document_links: Collection[str] = ()
     status_code: int = 200
     response_time_ms: float = 0.0
     error: Optional[str] = None
@@ -1,28 +1,43 @@
 """
 Serviço principal de scraping — pipeline direto.
 
-Pipeline: probe → scrape main → heuristic links → scrape subpages (paralelo).
+Pipeline: probe (+ scrape main especulativo) → scrape main → heuristic links → scrape subpages (paralelo).
 Cada request usa IP rotativo descartável. Worker é o único limite.
 """
 
 import asyncio
+import re
+from contextvars import ContextVar
 import time
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from enum import Enum
 
 from .models import ScrapedPage, ScrapeResult
 from .constants import (
-    REQUEST_TIMEOUT, MAX_RETRIES, MAX_SUBPAGES,
-    PER_DOMAIN_CONCURRENT, build_headers, smart_referer,
+    REQUEST_TIMEOUT, MAX_RETRIES, MAX_SUBPAGES, FALLBACK_ENABLED, FALLBACK_HEDGE_DELAY,
+    PER_DOMAIN_CONCURRENT, SPECULATIVE_MAIN_SCRAPE, build_headers, smart_referer,
+    pin_header_profile,
+)
+from .html_parser import (
+    is_cloudflare_challenge, is_soft_404, is_usable_content, normalize_url, parse_html, url_host,
 )
-from .html_parser import is_cloudflare_challenge, is_soft_404, normalize_url, parse_html
 from .link_selector import filter_non_html_links, prioritize_links
 from .url_prober import url_prober, URLNotReachable
-from .http_client import cffi_scrape, cffi_scrape_safe
+from .http_client import (
+    cffi_scrape, cffi_scrape_safe, fallback_scrape_safe, curl_error_label,
+    is_host_failure_status, BODY_TOO_LARGE, CURL_ERRORS, TIMEOUT_ERRORS, HTTPStatusError,
+)
+from .error_patterns import match_by_priority
+from .adaptive_limiter import get_domain_limiter
+from .circuit_breaker import is_circuit_open, record_bulk, record_success, record_failure
 
 logger = logging.getLogger(__name__)
 
+# Rótulo de log da empresa corrente ("[B1I0]"). Definido na entrada do
+# pipeline e herdado pelas tasks filhas — não precisa descer por parâmetro.
+_ctx_label: ContextVar[str] = ContextVar("scrape_ctx_label", default="")
+
 
 class FailureType(Enum):
     TIMEOUT = "timeout"
@@ -42,40 +57,95 @@ async def scrape_all_subpages(
     max_subpages: int = MAX_SUBPAGES,
     ctx_label: str = "",
     request_id: str = "",
+    deadline: Optional[float] = None,
 ) -> ScrapeResult:
     """
     Pipeline principal: probe → scrape main → heuristic links → scrape subpages.
+
+    `deadline` (time.monotonic()): orçamento da empresa inteira. Esgotado no
+    probe/main page, retorna sem páginas (reason "company_deadline"); nas
+    subpáginas, as em voo são canceladas e o resultado sai com a main page e
+    as subpáginas já concluídas.
     """
+    _ctx_label.set(ctx_label)
+    pin_header_profile()
     overall_start = time.perf_counter()
     meta = ScrapeResult()
 
     # 1. PROBE URL
+    # Scrape especulativo: a main page da URL original sai junto com o probe.
+    # Quando o probe confirma a própria URL (caso comum) o resultado já está
+    # a caminho; se ele escolher outra variação ou falhar, a task é cancelada.
     t_probe = time.perf_counter()
+    base_url = url
+    speculative_url = url if url.startswith(('http://', 'https://')) else 'https://' + url
+    speculative = None
+    if SPECULATIVE_MAIN_SCRAPE and not is_circuit_open(url_host(speculative_url)):
+        speculative = asyncio.create_task(_scrape_page_with_retry(speculative_url))
+    budget = _company_budget(deadline)
     try:
-        best_url, probe_time = await url_prober.probe(url)
-        url = best_url
-        meta.probe_ok = True
-    except URLNotReachable as e:
-        meta.probe_time_ms = (time.perf_counter() - t_probe) * 1000
-        log_msg = e.get_log_message()
-        logger.error(f"{ctx_label} URL inacessível: {url} - {log_msg}")
-        error_type = getattr(e, 'error_type', None)
-        meta.main_page_fail_reason = f"probe_{error_type.value if error_type else 'unknown'}"
+        async with budget:
+            try:
+                try:
+                    best_url, probe_time = await _probe_or_speculative(url, speculative_url, speculative)
+                    url = best_url
+                    meta.probe_ok = True
+                except URLNotReachable as e:
+                    meta.probe_time_ms = (time.perf_counter() - t_probe) * 1000
+                    log_msg = e.get_log_message()
+                    logger.error("%s URL inacessível: %s - %s", ctx_label, url, log_msg)
+                    error_type = getattr(e, 'error_type', None)
+                    meta.main_page_fail_reason = f"probe_{error_type.value if error_type else 'unknown'}"
+                    meta.total_time_ms = (time.perf_counter() - overall_start) * 1000
+                    return meta
+                except Exception as e:
+                    meta.probe_ok = True
+                    logger.warning("%s Erro no probe, usando URL original: %s", ctx_label, e)
+                meta.probe_time_ms = (time.perf_counter() - t_probe) * 1000
+
+                # 2. SCRAPE MAIN PAGE
+                # Filiais costumam compartilhar o site: domínio com circuito aberto falha
+                # na hora em vez de pagar timeout + fallback de novo
+                domain = url_host(url)
+                if is_circuit_open(domain):
+                    meta.main_page_fail_reason = "circuit_open"
+                    meta.total_time_ms = (time.perf_counter() - overall_start) * 1000
+                    return meta
+
+                t_main = time.perf_counter()
+                if speculative is not None and url == speculative_url:
+                    main_page = await speculative
+                else:
+                    main_page = await _scrape_page_with_retry(url)
+                meta.main_scrape_time_ms = (time.perf_counter() - t_main) * 1000
+            finally:
+                if speculative is not None and not speculative.done():
+                    speculative.cancel()
+    except TimeoutError:
+        if not budget.expired():
+            raise
+        # Prazo da empresa esgotado no probe ou na main page: nada a aproveitar
+        logger.warning("%s Prazo esgotado antes da main page: %s", ctx_label, url)
+        meta.main_page_fail_reason = "company_deadline"
         meta.total_time_ms = (time.perf_counter() - overall_start) * 1000
         return meta
-    except Exception as e:
-        meta.probe_ok = True
-        logger.warning(f"{ctx_label} Erro no probe, usando URL original: {e}")
-    meta.probe_time_ms = (time.perf_counter() - t_probe) * 1000
 
-    # 2. SCRAPE MAIN PAGE
-    t_main = time.perf_counter()
-    main_page = await _scrape_page_with_retry(url, ctx_label)
-    meta.main_scrape_time_ms = (time.perf_counter() - t_main) * 1000
+    # Mesma regra das subpáginas: status 0 (nenhuma tentativa teve resposta
+    # HTTP), 429 e 5xx são falha do host; qualquer outra resposta é sucesso.
+    # Corpo acima do teto também sai com 0, mas o host respondeu.
+    if main_page is not None:
+        if main_page.status_code == 0 and not _is_body_too_large(main_page):
+            record_failure(domain)
+            # Variação probada não respondeu: próximo pedido do site refaz o probe
+            url_prober.invalidate(base_url)
+        elif is_host_failure_status(main_page.status_code):
+            record_failure(domain)
+        else:
+            record_success(domain)
 
     if not main_page or not main_page.success:
         fail_reason = _get_fail_reason(main_page)
-        logger.error(f"{ctx_label} Falha main page {url} reason={fail_reason}")
+        logger.error("%s Falha main page %s reason=%s", ctx_label, url, fail_reason)
         meta.main_page_fail_reason = fail_reason
         meta.total_time_ms = (time.perf_counter() - overall_start) * 1000
         return meta
@@ -83,184 +153,421 @@ async def scrape_all_subpages(
     meta.main_page_ok = True
 
     # 3. EXTRAIR E PRIORIZAR LINKS
-    all_links = set(main_page.links)
-    filtered = filter_non_html_links(all_links)
-    target_subpages = prioritize_links(filtered, url)[:max_subpages]
+    # main_page.links é o set do parse_html: filtra direto, sem recriar o set
+    filtered = filter_non_html_links(main_page.links)
+    target_subpages = (
+        _dedupe_targets(prioritize_links(filtered, url), main_page.url, max_subpages)
+        if filtered and max_subpages > 0 else []
+    )
 
-    meta.links_in_html = len(all_links)
+    meta.links_in_html = len(main_page.links)
     meta.links_after_filter = len(filtered)
     meta.links_selected = len(target_subpages)
 
-    # 4. SCRAPE SUBPAGES EM PARALELO
-    t_sub = time.perf_counter()
-    subpages = []
+    # 4. SCRAPE SUBPAGES EM PARALELO — sem alvo, pula direto para o consolidado
+    subpages: List[ScrapedPage] = []
     if target_subpages:
-        domain_sem = asyncio.Semaphore(PER_DOMAIN_CONCURRENT)
+        t_sub = time.perf_counter()
         subpages = await _scrape_subpages_parallel(
-            target_subpages, domain_sem, ctx_label
+            target_subpages, PER_DOMAIN_CONCURRENT, deadline
         )
-    meta.subpages_time_ms = (time.perf_counter() - t_sub) * 1000
-
-    # 5. CONSOLIDAR
-    all_pages = [main_page] + subpages
-    meta.pages = all_pages
-    meta.subpages_attempted = len(subpages)
-    meta.subpages_ok = sum(1 for p in subpages if p.success)
-    meta.total_time_ms = (time.perf_counter() - overall_start) * 1000
+        meta.subpages_time_ms = (time.perf_counter() - t_sub) * 1000
+        if len(subpages) < len(target_subpages):
+            logger.debug("%s Prazo esgotado: %d/%d subpages concluídas",
+                         ctx_label, len(subpages), len(target_subpages))
 
+    # 5. CONSOLIDAR — uma passada pelas subpáginas (contagem + erros)
+    subpages_ok = 0
     error_breakdown: dict = {}
     for p in subpages:
-        if not p.success and p.error:
+        if p.success:
+            subpages_ok += 1
+        elif p.error:
             cat = _classify_subpage_error(p.error)
             error_breakdown[cat] = error_breakdown.get(cat, 0) + 1
+
+    all_pages = [main_page, *subpages]
+    meta.pages = all_pages
+    meta.subpages_attempted = len(subpages)
+    meta.subpages_ok = subpages_ok
     meta.subpage_errors = error_breakdown
+    meta.total_time_ms = (time.perf_counter() - overall_start) * 1000
 
-    ok = sum(1 for p in all_pages if p.success)
+    # main page chegou aqui com sucesso
+    ok = 1 + subpages_ok
+    # %-style: só formata se o handler aceitar o registro (caminho por empresa)
     logger.info(
-        f"{ctx_label} {url[:50]} | {ok}/{len(all_pages)} ok | "
-        f"probe={meta.probe_time_ms:.0f}ms main={meta.main_scrape_time_ms:.0f}ms "
-        f"sub={meta.subpages_time_ms:.0f}ms total={meta.total_time_ms:.0f}ms "
-        f"links={meta.links_in_html}->{meta.links_selected} "
-        f"subpages={meta.subpages_ok}/{meta.subpages_attempted}"
+        "%s %.50s | %d/%d ok | probe=%.0fms main=%.0fms sub=%.0fms total=%.0fms "
+        "links=%d->%d subpages=%d/%d",
+        ctx_label, url, ok, len(all_pages),
+        meta.probe_time_ms, meta.main_scrape_time_ms,
+        meta.subpages_time_ms, meta.total_time_ms,
+        meta.links_in_html, meta.links_selected,
+        meta.subpages_ok, meta.subpages_attempted,
     )
     return meta
 
 
-async def _scrape_page_with_retry(
-    url: str, ctx_label: str = ""
-) -> Optional[ScrapedPage]:
-    """Scrape com retry. Cada tentativa usa IP rotativo diferente."""
+def _company_budget(deadline: Optional[float]) -> asyncio.Timeout:
+    """asyncio.timeout com o que resta do prazo da empresa (None = sem prazo)."""
+    if deadline is None:
+        return asyncio.timeout(None)
+    return asyncio.timeout(max(0.0, deadline - time.monotonic()))
+
+
+async def _probe_or_speculative(
+    url: str,
+    speculative_url: str,
+    speculative: Optional["asyncio.Task[Optional[ScrapedPage]]"],
+) -> Tuple[str, float]:
+    """
+    Probe da URL, em corrida com o scrape especulativo da main page. Se o
+    especulativo terminar antes e com sucesso, o site já respondeu na própria
+    URL: o probe é cancelado e a URL especulativa é devolvida direto.
+    """
+    if speculative is None:
+        return await url_prober.probe(url)
+
+    probe = asyncio.create_task(url_prober.probe(url))
+    try:
+        await asyncio.wait((probe, speculative), return_when=asyncio.FIRST_COMPLETED)
+        if not probe.done() and speculative.exception() is None:
+            page = speculative.result()
+            if page is not None and page.success:
+                return speculative_url, 0.0
+        return await probe
+    finally:
+        probe.cancel()
+
+
+def _dedupe_targets(links: List[str], main_url: str, limit: int) -> List[str]:
+    """
+    Normaliza e remove duplicatas (mesma URL canônica) e a própria main page,
+    preservando a ordem de prioridade. Retorna até `limit` URLs.
+    """
+    visited = {normalize_url(main_url).rstrip('/')}
+    targets: List[str] = []
+    for link in links:
+        normalized = normalize_url(link)
+        key = normalized.rstrip('/')
+        if key in visited:
+            continue
+        visited.add(key)
+        targets.append(normalized)
+        if len(targets) >= limit:
+            break
+    return targets
+
+
+async def _scrape_page_with_retry(url: str) -> Optional[ScrapedPage]:
+    """
+    Scrape com retry. Cada tentativa usa IP rotativo diferente.
+    O fallback httpx entra em hedge na 1ª tentativa (se ela demorar) ou,
+    se não chegou a disparar, como última tentativa depois de falhas de
+    transporte.
+    """
     last_page = None
+    fallback_tried = not FALLBACK_ENABLED
 
     for attempt in range(1 + MAX_RETRIES):
-        page = await _do_scrape(url, ctx_label)
+        if attempt == 0 and not fallback_tried and FALLBACK_HEDGE_DELAY > 0:
+            page, fallback_tried = await _hedged_scrape(url, FALLBACK_HEDGE_DELAY)
+        else:
+            page = await _do_scrape(url)
 
         if page.success:
             return page
 
         last_page = page
 
-        if _is_site_rejection(page.error):
+        if not _is_retryable(page):
             return page
 
         if attempt < MAX_RETRIES:
-            logger.debug(f"{ctx_label} Retry {attempt+2}/{1+MAX_RETRIES} para {url[:50]}")
+            logger.debug("%s Retry %d/%d para %.50s",
+                         _ctx_label.get(), attempt + 2, 1 + MAX_RETRIES, url)
+
+    if not fallback_tried and not _is_body_too_large(last_page):
+        page = await _do_scrape(url, fallback_scrape_safe)
+        if page.success:
+            logger.debug("%s Fallback httpx ok para %.50s", _ctx_label.get(), url)
+            return page
 
     return last_page
 
 
-async def _do_scrape(url: str, ctx_label: str = "") -> ScrapedPage:
-    """Executa scrape via cffi_scrape_safe — IP rotativo descartável."""
+async def _hedged_scrape(url: str, delay: float) -> Tuple[ScrapedPage, bool]:
+    """
+    Hedged request: se o principal não terminar em `delay` s, dispara o
+    fallback em paralelo e fica com o primeiro resultado válido; o perdedor
+    é cancelado. Sem sucesso, devolve o resultado do principal (classificação
+    de erro/retry continua baseada nele).
+
+    Returns:
+        (página, se o fallback chegou a ser disparado)
+    """
+    primary = asyncio.create_task(_do_scrape(url))
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result(), False
+
+        fallback = asyncio.create_task(_do_scrape(url, fallback_scrape_safe))
+        pending.add(fallback)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page = task.result()
+                if page.success:
+                    if task is fallback:
+                        logger.debug("%s Hedge httpx venceu para %.50s", _ctx_label.get(), url)
+                    return page, True
+        return primary.result(), True
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _do_scrape(
+    url: str,
+    scrape_fn=cffi_scrape_safe,
+    *,
+    _is_cf=is_cloudflare_challenge,
+    _is_404=is_soft_404,
+    _Page=ScrapedPage,
+) -> ScrapedPage:
+    """
+    Executa scrape via `scrape_fn` — cffi_scrape_safe (IP rotativo descartável)
+    ou fallback_scrape_safe; ambos expõem last_error/last_status.
+    Globais do hot path ligadas como default args (LOAD_FAST em vez de LOAD_GLOBAL).
+    """
     try:
-        text, docs, links = await cffi_scrape_safe(url)
+        text, docs, links = await scrape_fn(url)
 
         if not text:
-            transport_err = cffi_scrape_safe.last_error or "empty_response"
-            return ScrapedPage(url=url, content="", error=f"proxy_fail:{transport_err}")
+            transport_err = scrape_fn.last_error or "empty_response"
+            return _Page(url=url, content="", error=f"proxy_fail:{transport_err}",
+                         status_code=scrape_fn.last_status)
+
+        if _is_cf(text):
+            return _Page(url=url, content="", error="Cloudflare",
+                         links=links, document_links=docs, status_code=403)
+
+        if _is_404(text):
+            return _Page(url=url, content="", error="Soft 404",
+                         links=links, document_links=docs, status_code=404)
 
-        if is_cloudflare_challenge(text):
-            return ScrapedPage(url=url, content="", error="Cloudflare",
-                               links=list(links), document_links=list(docs), status_code=403)
+        return _Page(url=url, content=text, links=links,
+                     document_links=docs, status_code=scrape_fn.last_status)
 
-        if is_soft_404(text):
-            return ScrapedPage(url=url, content="", error="Soft 404",
-                               links=list(links), document_links=list(docs), status_code=404)
+    except Exception as e:
+        return _Page(url=url, content="",
+                     error=f"scrape_exception:{type(e).__name__}:{str(e)[:50]}")
 
-        return ScrapedPage(url=url, content=text, links=list(links),
-                           document_links=list(docs), status_code=200)
 
+async def _scrape_single_subpage(
+    url: str,
+    outcomes: List[bool],
+    *,
+    _scrape=cffi_scrape,
+    _normalize=normalize_url,
+    _usable=is_usable_content,
+    _Page=ScrapedPage,
+    _timeouts=TIMEOUT_ERRORS,
+    _curl_errors=CURL_ERRORS,
+    _curl_label=curl_error_label,
+    _status_error=HTTPStatusError,
+    _host_failure=is_host_failure_status,
+) -> ScrapedPage:
+    """
+    Scrape de uma subpágina com IP rotativo próprio (globais como default args).
+    O resultado para o circuit breaker e o AIMD vai para `outcomes`: timeout,
+    erro de transporte, 429 e 5xx contam como falha; qualquer outra resposta
+    (404, 410, página vazia, soft 404) não — o host respondeu.
+    """
+    normalized = _normalize(url)
+    try:
+        text, docs, _ = await _scrape(normalized)
+        outcomes.append(True)
+
+        if not _usable(text):
+            return _Page(url=normalized, content="", error="Empty or soft 404")
+
+        return _Page(url=normalized, content=text,
+                     document_links=docs, status_code=200)
+
+    except _timeouts:
+        # Timeout é a falha mais comum: erro fixo, sem formatar a exceção
+        outcomes.append(False)
+        return _Page(url=normalized, content="", error="timeout")
+    except _status_error as e:
+        outcomes.append(not _host_failure(e.status_code))
+        return _Page(url=normalized, content="", error=str(e),
+                     status_code=e.status_code)
+    except _curl_errors as e:
+        # Demais falhas do libcurl: rótulo pré-computado pelo código. Corpo
+        # acima do teto não é falha do host (ele respondeu)
+        label = _curl_label(e)
+        outcomes.append(label == BODY_TOO_LARGE)
+        return _Page(url=normalized, content="", error=label)
     except Exception as e:
-        return ScrapedPage(url=url, content="",
-                           error=f"scrape_exception:{type(e).__name__}:{str(e)[:50]}")
+        # Nem timeout, nem libcurl, nem status HTTP: erro local (parse etc.),
+        # não é sinal de host com problema
+        outcomes.append(True)
+        return _Page(url=normalized, content="", error=str(e)[:200])
 
 
 async def _scrape_subpages_parallel(
     urls: List[str],
-    domain_sem: asyncio.Semaphore,
-    ctx_label: str = "",
+    max_concurrent: int = PER_DOMAIN_CONCURRENT,
+    deadline: Optional[float] = None,
 ) -> List[ScrapedPage]:
-    """Scrape subpáginas em paralelo — cada uma com IP rotativo próprio."""
-
-    async def scrape_one(url: str) -> ScrapedPage:
-        async with domain_sem:
-            normalized = normalize_url(url)
-            try:
-                text, docs, _ = await cffi_scrape(normalized)
+    """
+    Scrape subpáginas com pool de workers — cada uma com IP rotativo próprio.
+
+    Cada worker puxa a próxima URL da fila assim que termina a anterior:
+    uma subpágina lenta ocupa só o seu worker, sem segurar as demais.
+    Quantas subpáginas do domínio ficam em voo segue o AimdLimiter do
+    domínio, compartilhado entre empresas (filiais) do mesmo site.
+    Subpáginas são do mesmo domínio: o circuit breaker é checado uma vez
+    para o lote inteiro e os resultados são registrados juntos no final.
+    Com `deadline`, o pool é cancelado quando o prazo passa (inclusive as
+    requisições em voo); só as subpáginas concluídas entram no retorno.
+    """
+    domain = url_host(urls[0])
+    if is_circuit_open(domain):
+        logger.debug("%s Circuit aberto para %s, pulando %d subpages",
+                     _ctx_label.get(), domain, len(urls))
+        return [ScrapedPage(url=u, content="", error="Circuit open") for u in urls]
+
+    # Todas as subpáginas disparam de uma vez, limitadas só pelo número de
+    # workers. O iterador compartilhado faz o papel de fila: no event loop
+    # não há troca de contexto entre o next() e o await.
+    pending = enumerate(urls)
+    results: List[Optional[ScrapedPage]] = [None] * len(urls)
+    outcomes: List[bool] = []
+    scrape_one = _scrape_single_subpage
+
+    now = time.monotonic
+    n_workers = max(1, min(max_concurrent, len(urls)))
+    # Timeouts/429/5xx reduzem quantas subpáginas do domínio ficam em voo
+    # (AIMD); sucessos devolvem o limite até max_concurrent. O estado fica
+    # no registro: a próxima empresa do mesmo site começa do limite aprendido
+    limiter = get_domain_limiter(domain, max_concurrent)
+
+    async def worker():
+        for idx, url in pending:
+            async with limiter:
+                if deadline is not None and now() >= deadline:
+                    return
+                results[idx] = await scrape_one(url, outcomes)
+                # scrape_one anota o resultado e retorna sem novo await:
+                # o último outcome é o desta subpágina
+                limiter.record(outcomes[-1])
+
+    budget = _company_budget(deadline)
+    try:
+        async with budget:
+            await asyncio.gather(*(worker() for _ in range(n_workers)))
+    except TimeoutError:
+        if not budget.expired():
+            raise
+    # outcomes só tem False para timeout/transporte/429/5xx (ver
+    # _scrape_single_subpage): 404 seguidos não abrem o circuito
+    record_bulk(domain, outcomes)
+    if len(outcomes) < len(urls):
+        return [page for page in results if page is not None]
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Classificação de erros — um único regex por classificador (ver error_patterns).
+# ---------------------------------------------------------------------------
+_REJECTION_PATTERN = re.compile(
+    r"403|429|cloudflare|captcha|waf|forbidden|blocked", re.IGNORECASE
+)
 
-                if not text or len(text) < 100 or is_soft_404(text) or is_cloudflare_challenge(text):
-                    return ScrapedPage(url=normalized, content="", error="Empty or soft 404")
+_SUBPAGE_ERROR_PATTERN = re.compile(
+    r"(?P<timeout>timeout)|(?P<cloudflare>cloudflare)|(?P<empty_content>soft 404|empty)",
+    re.IGNORECASE,
+)
 
-                return ScrapedPage(url=normalized, content=text,
-                                   document_links=list(docs), status_code=200)
+_FAILURE_PATTERN = re.compile(
+    r"(?P<timeout>timeout)"
+    r"|(?P<cloudflare>cloudflare)"
+    r"|(?P<waf>403|waf)"
+    r"|(?P<captcha>captcha)"
+    # lookahead: "rate" e "limit" em qualquer ordem/distância, consumindo só
+    # a palavra (não engole um timeout/403 entre as duas)
+    r"|(?P<rate_limit>rate(?=(?s:.*)limit)|limit(?=(?s:.*)rate))"
+    r"|(?P<empty_content>empty|404)"
+    r"|(?P<ssl_error>ssl|certificate)"
+    r"|(?P<dns_error>dns|resolve)"
+    r"|(?P<connection_error>connect)",
+    re.IGNORECASE,
+)
 
-            except Exception as e:
-                return ScrapedPage(url=normalized, content="", error=str(e))
+_FAIL_REASON_PATTERN = re.compile(
+    r"(?P<thin_body>thin_body)|(?P<proxy_fail>proxy_fail)|(?P<cloudflare>cloudflare)",
+    re.IGNORECASE,
+)
 
-    tasks = [scrape_one(u) for u in urls]
-    results = await asyncio.gather(*tasks)
-    return list(results)
+# Grupo → motivo; None = repassa o erro original (ex.: proxy_fail:<detalhe>)
+_FAIL_REASON_BY_GROUP = {
+    "thin_body": "scrape_thin_content",
+    "proxy_fail": None,
+    "cloudflare": "scrape_blocked_cloudflare",
+}
 
 
 def _is_site_rejection(error: str) -> bool:
     if not error:
         return False
-    err = error.lower()
-    return any(sig in err for sig in (
-        "403", "429", "cloudflare", "captcha", "waf", "forbidden", "blocked",
-    ))
+    return _REJECTION_PATTERN.search(error) is not None
+
+
+def _is_body_too_large(page: Optional[ScrapedPage]) -> bool:
+    """Página descartada pelo teto de corpo: erro terminal, o host respondeu."""
+    return page is not None and bool(page.error) and page.error.endswith(BODY_TOO_LARGE)
+
+
+def _is_retryable(page: ScrapedPage) -> bool:
+    """
+    Retry (novo IP) só compensa em falha de transporte (status 0) ou 5xx.
+    Uma resposta HTTP válida mas fina / soft 404 voltaria igual — não repete;
+    corpo acima do teto também (viria do mesmo tamanho).
+    """
+    if _is_site_rejection(page.error) or _is_body_too_large(page):
+        return False
+    return page.status_code == 0 or page.status_code >= 500
 
 
 def _get_fail_reason(page: Optional[ScrapedPage]) -> str:
     if not page:
         return "scrape_null_response"
-    if page.error:
-        err = page.error.lower()
-        if "proxy_fail" in err:
-            return page.error
-        if "cloudflare" in err:
-            return "scrape_blocked_cloudflare"
-        return f"scrape_error({page.error[:40]})"
-    if page.content and len(page.content) < 100:
-        return "scrape_thin_content"
-    if not page.content:
+    error = page.error
+    if error:
+        group = match_by_priority(_FAIL_REASON_PATTERN, error)
+        if group is None:
+            return f"scrape_error({error[:40]})"
+        return _FAIL_REASON_BY_GROUP[group] or error
+    content = page.content
+    if not content:
         return "scrape_empty_content"
+    if len(content) < 100:
+        return "scrape_thin_content"
     return "scrape_unknown"
 
 
 def _classify_subpage_error(error: str) -> str:
     if not error:
         return "unknown"
-    err = error.lower()
-    if "timeout" in err:
-        return "timeout"
-    if "cloudflare" in err:
-        return "cloudflare"
-    if "soft 404" in err or "empty" in err:
-        return "empty_content"
-    return "scrape_fail"
+    return match_by_priority(_SUBPAGE_ERROR_PATTERN, error) or "scrape_fail"
 
 
 def _classify_error(error_message: str) -> FailureType:
     if not error_message:
         return FailureType.UNKNOWN
-    err = error_message.lower()
-
-    if "timeout" in err:
-        return FailureType.TIMEOUT
-    if "cloudflare" in err:
-        return FailureType.CLOUDFLARE
-    if "403" in err or "waf" in err:
-        return FailureType.WAF
-    if "captcha" in err:
-        return FailureType.CAPTCHA
-    if "rate" in err and "limit" in err:
-        return FailureType.RATE_LIMIT
-    if "empty" in err or "404" in err:
-        return FailureType.EMPTY_CONTENT
-    if "ssl" in err or "certificate" in err:
-        return FailureType.SSL_ERROR
-    if "dns" in err or "resolve" in err:
-        return FailureType.DNS_ERROR
-    if "connection" in err or "connect" in err:
-        return FailureType.CONNECTION_ERROR
-    return FailureType.UNKNOWN
+    group = match_by_priority(_FAILURE_PATTERN, error_message)
+    return FailureType(group) if group else FailureType.UNKNOWN
@@ -7,17 +7,25 @@ import asyncio
 import os
 import time
 import logging
+import re
 import socket
-from typing import List, Tuple, Optional
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Optional
 from urllib.parse import urlparse
 from enum import Enum
 
 from .constants import PROBE_TIMEOUT, MAX_RETRIES, build_headers
+from .error_patterns import match_by_priority
 
 logger = logging.getLogger(__name__)
 
 _PROXY_URL = os.getenv("PROXY_GATEWAY_URL", "")
 
+# Cache de probe: resultado vale por host/URL durante o batch; LRU evita
+# crescimento ilimitado em batches de milhões de empresas.
+PROBE_CACHE_TTL = 600.0
+PROBE_CACHE_MAX_ENTRIES = 2048
+
 
 class ProbeErrorType(Enum):
     DNS_ERROR = "dns_error"
@@ -31,24 +39,34 @@ class ProbeErrorType(Enum):
     UNKNOWN = "unknown"
 
 
+_PROBE_ERROR_PATTERN = re.compile(
+    r"(?P<dns>nodename nor servname|name or service not known|getaddrinfo failed|dns|resolve)"
+    r"|(?P<refused>connection refused|errno 111|errno 61)"
+    r"|(?P<timeout>timeout|timed out|time out)"
+    r"|(?P<reset>connection reset|broken pipe|connection aborted)"
+    r"|(?P<ssl>ssl|certificate|cert|handshake)"
+    r"|(?P<redirect>redirect|too many|47)",
+    re.IGNORECASE,
+)
+
+_PROBE_ERROR_BY_GROUP = {
+    "refused": (ProbeErrorType.CONNECTION_REFUSED, "Conexão recusada"),
+    "timeout": (ProbeErrorType.CONNECTION_TIMEOUT, "Timeout"),
+    "reset": (ProbeErrorType.CONNECTION_REFUSED, "Conexão interrompida"),
+    "ssl": (ProbeErrorType.SSL_ERROR, "Erro SSL/TLS"),
+    "redirect": (ProbeErrorType.TOO_MANY_REDIRECTS, "Loop de redirects"),
+}
+
+
 def _classify_probe_error(error: Exception, url: str) -> Tuple[ProbeErrorType, str]:
-    error_str = str(error).lower()
+    group = match_by_priority(_PROBE_ERROR_PATTERN, str(error))
 
-    if any(x in error_str for x in ['nodename nor servname', 'name or service not known',
-                                      'getaddrinfo failed', 'dns', 'resolve']):
+    if group == "dns":
         return ProbeErrorType.DNS_ERROR, "DNS não resolve"
     if isinstance(error, socket.gaierror):
         return ProbeErrorType.DNS_ERROR, f"Falha DNS: {error}"
-    if any(x in error_str for x in ['connection refused', 'errno 111', 'errno 61']):
-        return ProbeErrorType.CONNECTION_REFUSED, "Conexão recusada"
-    if any(x in error_str for x in ['timeout', 'timed out', 'time out']):
-        return ProbeErrorType.CONNECTION_TIMEOUT, "Timeout"
-    if any(x in error_str for x in ['connection reset', 'broken pipe', 'connection aborted']):
-        return ProbeErrorType.CONNECTION_REFUSED, "Conexão interrompida"
-    if any(x in error_str for x in ['ssl', 'certificate', 'cert', 'handshake']):
-        return ProbeErrorType.SSL_ERROR, "Erro SSL/TLS"
-    if any(x in error_str for x in ['redirect', 'too many', '47']):
-        return ProbeErrorType.TOO_MANY_REDIRECTS, "Loop de redirects"
+    if group is not None:
+        return _PROBE_ERROR_BY_GROUP[group]
     if 'http' in type(error).__name__.lower():
         return ProbeErrorType.HTTP_ERROR, f"Erro HTTP: {error}"
     return ProbeErrorType.UNKNOWN, str(error)
@@ -68,28 +86,87 @@ class URLProber:
     def __init__(self, timeout: float = PROBE_TIMEOUT, max_retries: int = MAX_RETRIES):
         self.timeout = timeout
         self.max_retries = max_retries
-        self._cache: dict = {}
+        self._cache: "OrderedDict[str, Tuple[float, str, float]]" = OrderedDict()
+        # Probes em andamento por chave: chamadas concorrentes para o mesmo
+        # site (filiais no mesmo batch) aguardam o mesmo probe
+        self._inflight: Dict[str, "asyncio.Future[Tuple[str, float]]"] = {}
+
+    def _cache_key(self, base_url: str) -> str:
+        return base_url.strip().rstrip('/').lower()
+
+    def _cache_get(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, url, resp_time = entry
+        if time.monotonic() - stored_at > PROBE_CACHE_TTL:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return url, resp_time
+
+    def _cache_put(self, key: str, url: str, resp_time: float) -> None:
+        self._cache[key] = (time.monotonic(), url, resp_time)
+        self._cache.move_to_end(key)
+        while len(self._cache) > PROBE_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, base_url: str) -> None:
+        """Descarta o resultado em cache (ex.: a URL probada falhou no scrape)."""
+        if not base_url.startswith(('http://', 'https://')):
+            base_url = 'https://' + base_url
+        self._cache.pop(self._cache_key(base_url), None)
 
     async def probe(self, base_url: str) -> Tuple[str, float]:
-        if base_url in self._cache:
-            cached = self._cache[base_url]
-            return cached['url'], cached['time']
-
         if not base_url.startswith(('http://', 'https://')):
             base_url = 'https://' + base_url
 
+        cache_key = self._cache_key(base_url)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Cancelado foi o probe líder, não este chamador: refaz
+                if not inflight.cancelled():
+                    raise
+                return await self.probe(base_url)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            result = await self._probe_with_retry(base_url, cache_key)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marca como lida: sem espera, não loga "never retrieved"
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[cache_key]
+
+    async def _probe_with_retry(self, base_url: str, cache_key: str) -> Tuple[str, float]:
         last_error: Optional[URLNotReachable] = None
         for attempt in range(self.max_retries):
             try:
                 url, resp_time = await self._probe_once(base_url)
-                self._cache[base_url] = {'url': url, 'time': resp_time}
+                self._cache_put(cache_key, url, resp_time)
                 return url, resp_time
             except URLNotReachable as e:
                 last_error = e
                 if e.error_type not in RETRYABLE_PROBE_ERRORS:
                     raise
                 if attempt < self.max_retries - 1:
-                    logger.info(f"Probe retry {attempt+2}/{self.max_retries} para {base_url} ({e.error_type.value})")
+                    logger.info("Probe retry %d/%d para %s (%s)",
+                                attempt + 2, self.max_retries, base_url, e.error_type.value)
 
         raise last_error  # type: ignore[misc]
 
@@ -131,22 +208,23 @@ class URLProber:
     async def _test_url(self, url):
         """Testa URL com session compartilhada + semáforo global."""
         try:
-            from .http_client import get_shared_session, get_semaphore
+            from .http_client import get_shared_session, get_semaphore, split_timeout
         except ImportError:
             return None, (ProbeErrorType.UNKNOWN, "http_client não disponível")
 
         try:
-            headers, _ = build_headers()
+            headers, impersonate = build_headers()
             proxy = _PROXY_URL
             sem = get_semaphore()
+            timeout = split_timeout(self.timeout)
 
             async with sem:
-                session = get_shared_session()
+                session = get_shared_session(impersonate, proxy)
                 start = time.perf_counter()
                 try:
                     resp = await session.head(
                         url, headers=headers, proxy=proxy,
-                        allow_redirects=True, timeout=self.timeout, max_redirects=5,
+                        allow_redirects=True, timeout=timeout, max_redirects=5,
                     )
                     elapsed = (time.perf_counter() - start) * 1000
 
@@ -154,7 +232,7 @@ class URLProber:
                         start = time.perf_counter()
                         resp = await session.get(
                             url, headers=headers, proxy=proxy,
-                            allow_redirects=True, timeout=self.timeout, max_redirects=5,
+                            allow_redirects=True, timeout=timeout, max_redirects=5,
                         )
                         elapsed = (time.perf_counter() - start) * 1000
 
@@ -164,7 +242,7 @@ class URLProber:
                         start = time.perf_counter()
                         resp = await session.get(
                             url, headers=headers, proxy=proxy,
-                            allow_redirects=True, timeout=self.timeout, max_redirects=5,
+                            allow_redirects=True, timeout=timeout, max_redirects=5,
                         )
                         elapsed = (time.perf_counter() - start) * 1000
                         return (elapsed, resp.status_code), None
@@ -26,12 +26,14 @@ class ProxyPool:
     def __init__(self):
         self._gateway_url: str = ""
         self._loaded = False
+        self._preload_attempted = False
         self._stats = ProxyStats()
         self._health_checked = False
 
     async def preload(self) -> int:
         from app.core.proxy import proxy_manager
 
+        self._preload_attempted = True
         if not proxy_manager.is_gateway_mode:
             logger.warning("[ProxyPool] Configure PROXY_GATEWAY_URL.")
             return 0
@@ -51,10 +53,8 @@ class ProxyPool:
             try:
                 from app.services.scraper.http_client import get_shared_session
                 session = get_shared_session()
-                resp = await asyncio.wait_for(
-                    session.get(test_url, proxy=self._gateway_url, timeout=timeout),
-                    timeout=timeout,
-                )
+                async with asyncio.timeout(timeout):
+                    resp = await session.get(test_url, proxy=self._gateway_url, timeout=timeout)
                 lat = (time.perf_counter() - t0) * 1000
                 if resp.status_code == 200:
                     latencies.append(lat)
@@ -113,7 +113,9 @@ proxy_pool = ProxyPool()
 
 
 async def get_healthy_proxy(max_attempts: int = 5) -> Optional[str]:
-    if not proxy_pool._loaded:
+    # Gateway vem do ambiente e não muda em runtime: preload uma vez só,
+    # mesmo que falhe (sem repetir import + warning a cada chamada)
+    if not proxy_pool._preload_attempted:
         await proxy_pool.preload()
     return proxy_pool.get_next_proxy()
 
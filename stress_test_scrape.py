@@ -749,4 +749,6 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Mesmo event loop da API (uvloop quando disponível) para medir o caminho real
+    from app.core import event_loop
+    event_loop.run(main())